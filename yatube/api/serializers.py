@@ -0,0 +1,112 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+
+
+def _image(post):
+    return default_storage.url(post.image.name) if post.image else None
+
+
+# Поле ответа -> (столбцы для only(), способ получить значение).
+POST_FIELDS = {
+    'id': ((), lambda post: post.pk),
+    'text': (('text',), lambda post: post.text),
+    'pub_date': ((), lambda post: post.pub_date.isoformat()),
+    'author': (('author__username',), lambda post: post.author.username),
+    'group': (
+        ('group__slug',),
+        lambda post: post.group.slug if post.group_id else None
+    ),
+    'image': (('image',), _image),
+    'comments_count': (('comments_count',), lambda post: post.comments_count),
+}
+# Нужны всегда: по ним строятся курсор и ключ кэша.
+KEY_COLUMNS = (
+    'pub_date', 'cache_version', 'author', 'group', 'group__cache_version'
+)
+COMMENTS = 'comments'
+
+
+class FieldsError(ValueError):
+    """В параметре ``fields=`` есть неизвестное поле."""
+
+
+def parse_fields(value, extra=()):
+    """Список полей из параметра ``fields=``; без него - все поля.
+
+    Неизвестное поле - FieldsError, чтобы опечатка не давала молча
+    пустой ответ.
+    """
+    allowed = tuple(POST_FIELDS) + tuple(extra)
+    if not value:
+        return allowed
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in allowed]
+    if unknown:
+        raise FieldsError(f'Неизвестные поля: {", ".join(unknown)}')
+    return tuple(dict.fromkeys(['id'] + fields))
+
+
+def project(posts, fields):
+    """Выбирает из БД только столбцы запрошенных полей.
+
+    Без поля text тексты постов не читаются вовсе.
+    """
+    columns = [
+        column
+        for name in fields if name in POST_FIELDS
+        for column in POST_FIELDS[name][0]
+    ]
+    return posts.select_related('author', 'group').only(
+        *KEY_COLUMNS, *columns
+    )
+
+
+def payload_key(post):
+    """Ключ кэша поста; версии меняются при правке поста и группы."""
+    group_version = post.group.cache_version if post.group_id else 0
+    return (
+        f'api-post:{post.pk}:{post.pub_date.timestamp()}:'
+        f'{post.cache_version}:{group_version}'
+    )
+
+
+def serialize(post, fields):
+    return {name: POST_FIELDS[name][1](post) for name in fields}
+
+
+def post_payloads(posts, fields):
+    """Словари постов с полями ``fields``.
+
+    Полные словари берутся из кэша одним get_many. Недостающие
+    сериализуются; в кэш они попадают, только если из БД прочитаны
+    все столбцы, иначе словарь был бы неполным.
+    """
+    fields = [name for name in fields if name in POST_FIELDS]
+    keys = [payload_key(post) for post in posts]
+    cached = cache.get_many(keys)
+    complete = set(fields) == set(POST_FIELDS)
+    missing = {}
+    payloads = []
+    for key, post in zip(keys, posts):
+        payload = cached.get(key)
+        if payload is None:
+            payload = serialize(post, POST_FIELDS if complete else fields)
+            if complete:
+                missing[key] = payload
+        payloads.append({name: payload[name] for name in fields})
+    if missing:
+        cache.set_many(missing, settings.API_PAYLOAD_CACHE_TIMEOUT)
+    return payloads
+
+
+def comment_payloads(comments):
+    return [
+        {
+            'id': comment.pk,
+            'author': comment.author.username,
+            'text': comment.text,
+            'created': comment.created.isoformat(),
+        }
+        for comment in comments
+    ]
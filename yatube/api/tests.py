@@ -0,0 +1,126 @@
+from http import HTTPStatus
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='api_author')
+        cls.reader = User.objects.create_user(username='api_reader')
+        cls.group = Group.objects.create(title='Группа', slug='api')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {i}'
+            )
+            for i in range(settings.POSTS_ON_PAGE + 2)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, name, data=None, **kwargs):
+        return self.client.get(reverse(name, kwargs=kwargs), data)
+
+    def test_feeds_mirror_pages(self):
+        """Ленты API отдают те же посты, что и HTML-страницы."""
+        self.client.force_login(self.reader)
+        cases = (
+            ('api:index', {}),
+            ('api:group_list', {'slug': self.group.slug}),
+            ('api:profile', {'username': self.author.username}),
+            ('api:follow_index', {}),
+        )
+        newest = self.posts[-1]
+        for name, kwargs in cases:
+            with self.subTest(name=name):
+                response = self.get(name, **kwargs)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                data = response.json()
+                self.assertEqual(len(data['results']), settings.POSTS_ON_PAGE)
+                self.assertEqual(data['results'][0], {
+                    'id': newest.pk,
+                    'text': newest.text,
+                    'pub_date': newest.pub_date.isoformat(),
+                    'author': self.author.username,
+                    'group': self.group.slug,
+                    'image': None,
+                    'comments_count': 0,
+                })
+                self.assertIsNone(data['previous'])
+                rest = self.client.get(data['next']).json()
+                self.assertEqual(
+                    [post['id'] for post in rest['results']],
+                    [post.pk for post in reversed(self.posts[:2])]
+                )
+                self.assertIsNone(rest['next'])
+
+    def test_sparse_fields_defer_text(self):
+        """С ``fields=`` отдаются только нужные поля, текст не читается."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get('api:index', {'fields': 'author,pub_date'})
+        result = response.json()['results'][0]
+        self.assertEqual(set(result), {'id', 'author', 'pub_date'})
+        self.assertFalse(any(
+            '"posts_post"."text"' in query['sql'] for query in queries
+        ))
+        response = self.get('api:index', {'fields': 'id,likes'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('likes', response.json()['detail'])
+
+    def test_payloads_cached_per_post(self):
+        """Сериализованные посты берутся из кэша до правки поста."""
+        self.get('api:index')
+        post = self.posts[-1]
+        Post.objects.filter(pk=post.pk).update(text='Тихая правка')
+        first = self.get('api:index').json()['results'][0]
+        self.assertEqual(first['text'], post.text)
+        post.text = 'Правка'
+        post.save()
+        first = self.get('api:index').json()['results'][0]
+        self.assertEqual(first['text'], 'Правка')
+
+    def test_post_detail_with_comments(self):
+        post = self.posts[0]
+        data = self.get('api:post_detail', post_id=post.pk).json()
+        self.assertEqual(data['id'], post.pk)
+        self.assertEqual(data['comments_count'], 1)
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']], ['Комментарий']
+        )
+        data = self.get(
+            'api:post_detail', {'fields': 'text'}, post_id=post.pk
+        ).json()
+        self.assertEqual(data, {'id': post.pk, 'text': post.text})
+
+    def test_errors_are_json(self):
+        cases = (
+            ('api:group_list', {'slug': 'missing'}, {}, HTTPStatus.NOT_FOUND),
+            ('api:post_detail', {'post_id': 0}, {}, HTTPStatus.NOT_FOUND),
+            ('api:index', {}, {'cursor': 'broken'}, HTTPStatus.BAD_REQUEST),
+            ('api:follow_index', {}, {}, HTTPStatus.UNAUTHORIZED),
+        )
+        for name, kwargs, data, status in cases:
+            with self.subTest(name=name, status=status):
+                response = self.get(name, data, **kwargs)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('detail', response.json())
+
+    def test_conditional_get(self):
+        response = self.get('api:index')
+        response = self.client.get(
+            reverse('api:index'), HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
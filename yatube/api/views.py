@@ -0,0 +1,137 @@
+from functools import wraps
+from http import HTTPStatus
+
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import etag, require_GET
+
+from posts import etags
+from posts.models import Comment, Group, Post, User
+from posts.utils import CursorPaginator
+from .serializers import (
+    COMMENTS, FieldsError, comment_payloads, parse_fields, post_payloads,
+    project
+)
+
+
+def json_response(data, status=HTTPStatus.OK):
+    return JsonResponse(
+        data, status=status, json_dumps_params={'ensure_ascii': False}
+    )
+
+
+def api_view(page_etag):
+    """Представление API: только GET, ответ 304 по ETag страницы с теми же
+    данными, ошибки в JSON."""
+    def decorator(view):
+        conditional = etag(page_etag)(view)
+
+        @wraps(view)
+        @require_GET
+        def wrapper(request, *args, **kwargs):
+            try:
+                return conditional(request, *args, **kwargs)
+            except Http404:
+                return json_response(
+                    {'detail': 'Не найдено.'}, HTTPStatus.NOT_FOUND
+                )
+            except (InvalidPage, FieldsError) as error:
+                return json_response(
+                    {'detail': str(error)}, HTTPStatus.BAD_REQUEST
+                )
+        return wrapper
+    return decorator
+
+
+def login_required(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return json_response(
+                {'detail': 'Нужна авторизация.'}, HTTPStatus.UNAUTHORIZED
+            )
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def link(request, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+
+
+def feed(request, posts, fields, keys=('pub_date', 'pk'), load=None):
+    """Страница ленты по курсору со списком постов в ``results``.
+
+    ``load`` превращает записи страницы в посты, если лента строится
+    не по самим постам.
+    """
+    paginator = CursorPaginator(posts, settings.POSTS_ON_PAGE, keys)
+    page = paginator.page(request.GET.get('cursor'))
+    objects = page.object_list
+    if load is not None:
+        objects = load(objects, fields)
+    return json_response({
+        'results': post_payloads(objects, fields),
+        'next': link(request, page.next_cursor),
+        'previous': link(request, page.previous_cursor),
+    })
+
+
+@api_view(etags.index_etag)
+def index(request):
+    fields = parse_fields(request.GET.get('fields'))
+    return feed(request, project(Post.objects.all(), fields), fields)
+
+
+@api_view(etags.group_etag)
+def group_posts(request, slug):
+    fields = parse_fields(request.GET.get('fields'))
+    group = get_object_or_404(Group, slug=slug)
+    return feed(request, project(group.group_posts.all(), fields), fields)
+
+
+@api_view(etags.profile_etag)
+def profile(request, username):
+    fields = parse_fields(request.GET.get('fields'))
+    author = get_object_or_404(User, username=username)
+    return feed(request, project(author.posts.all(), fields), fields)
+
+
+def _timeline_posts(entries, fields):
+    posts = project(Post.objects.all(), fields).in_bulk(
+        [entry.post_id for entry in entries]
+    )
+    return [
+        posts[entry.post_id] for entry in entries if entry.post_id in posts
+    ]
+
+
+@login_required
+@api_view(etags.follow_etag)
+def follow_index(request):
+    # Страница ленты читается из покрывающего индекса, посты - отдельно.
+    fields = parse_fields(request.GET.get('fields'))
+    entries = request.user.timeline.only('user', 'pub_date', 'post')
+    return feed(
+        request, entries, fields,
+        keys=('pub_date', 'post_id'), load=_timeline_posts
+    )
+
+
+@api_view(etags.post_etag)
+def post_detail(request, post_id):
+    fields = parse_fields(request.GET.get('fields'), extra=(COMMENTS,))
+    post = get_object_or_404(project(Post.objects.all(), fields), pk=post_id)
+    data = post_payloads([post], fields)[0]
+    if COMMENTS in fields:
+        data[COMMENTS] = comment_payloads(
+            Comment.objects.filter(post=post).select_related('author').only(
+                'text', 'created', 'author', 'author__username'
+            ).order_by('created', 'pk')
+        )
+    return json_response(data)
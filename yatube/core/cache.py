@@ -0,0 +1,282 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# SQLite ограничивает число параметров запроса (999 в старых сборках).
+MAX_PARAMS = 900
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE TABLE IF NOT EXISTS cache_meta ('
+    ' id INTEGER PRIMARY KEY CHECK (id = 1),'
+    ' entries INTEGER NOT NULL'
+    ')',
+    'INSERT OR IGNORE INTO cache_meta (id, entries) VALUES (1, 0)',
+    'CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN'
+    ' UPDATE cache_meta SET entries = entries + 1 WHERE id = 1; END',
+    'CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN'
+    ' UPDATE cache_meta SET entries = entries - 1 WHERE id = 1; END',
+)
+
+UPSERT = (
+    'INSERT INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?) '
+    'ON CONFLICT (key) DO UPDATE SET value = excluded.value,'
+    ' expires = excluded.expires, accessed = excluded.accessed'
+)
+
+
+def _chunks(items, size=MAX_PARAMS):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite, общий для всех процессов на одном хосте.
+
+    Целые числа хранятся как INTEGER, поэтому ``incr`` выполняется одним
+    UPDATE; остальные значения сериализуются pickle. Размер ограничен
+    MAX_ENTRIES: при переполнении удаляется 1/CULL_FREQUENCY записей,
+    к которым дольше всего не обращались. Время обращения обновляется
+    не чаще раза в LRU_RESOLUTION секунд, чтобы чтение не превращалось
+    в запись.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._lru_resolution = float(options.get('LRU_RESOLUTION', 1))
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+
+    @property
+    def _conn(self):
+        # Соединение своё у каждого потока и не переживает fork().
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(
+                self._path,
+                timeout=self._busy_timeout,
+                isolation_level=None,
+                check_same_thread=False
+            )
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('BEGIN IMMEDIATE')
+            for statement in SCHEMA:
+                conn.execute(statement)
+            conn.execute('COMMIT')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _encode(value):
+        if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _alive(self, expires, now):
+        return expires is None or expires > now
+
+    def _touch_stale(self, conn, keys, now):
+        if keys:
+            for chunk in _chunks(keys):
+                conn.execute(
+                    f'UPDATE cache SET accessed = ? WHERE key IN '
+                    f'({",".join("?" * len(chunk))})',
+                    (now, *chunk)
+                )
+
+    def _cull(self, conn):
+        entries = conn.execute(
+            'SELECT entries FROM cache_meta WHERE id = 1'
+        ).fetchone()[0]
+        if entries <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            conn.execute('DELETE FROM cache')
+            return
+        conn.execute(
+            'DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?',
+            (time.time(),)
+        )
+        entries = conn.execute(
+            'SELECT entries FROM cache_meta WHERE id = 1'
+        ).fetchone()[0]
+        if entries > self._max_entries:
+            conn.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY accessed LIMIT ?)',
+                (max(entries // self._cull_frequency, 1),)
+            )
+
+    def _write(self, rows):
+        conn = self._conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(UPSERT, rows)
+            self._cull(conn)
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def _fetch(self, keys):
+        now = time.time()
+        conn = self._conn
+        found = {}
+        stale = []
+        for chunk in _chunks(keys):
+            rows = conn.execute(
+                f'SELECT key, value, expires, accessed FROM cache '
+                f'WHERE key IN ({",".join("?" * len(chunk))})',
+                chunk
+            )
+            for key, value, expires, accessed in rows:
+                if not self._alive(expires, now):
+                    continue
+                found[key] = value
+                if now - accessed > self._lru_resolution:
+                    stale.append(key)
+        self._touch_stale(conn, stale, now)
+        return found
+
+    def _make_key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._make_key(key, version)
+        now = time.time()
+        conn = self._conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            added = row is None or not self._alive(row[0], now)
+            if added:
+                conn.execute(UPSERT, (
+                    key,
+                    self._encode(value),
+                    self.get_backend_timeout(timeout),
+                    now
+                ))
+                self._cull(conn)
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return added
+
+    def get(self, key, default=None, version=None):
+        key = self._make_key(key, version)
+        found = self._fetch([key])
+        if key not in found:
+            return default
+        return self._decode(found[key])
+
+    def get_many(self, keys, version=None):
+        keys_map = {self._make_key(key, version): key for key in keys}
+        found = self._fetch(list(keys_map))
+        return {
+            keys_map[key]: self._decode(value)
+            for key, value in found.items()
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._make_key(key, version)
+        self._write([(
+            key,
+            self._encode(value),
+            self.get_backend_timeout(timeout),
+            time.time()
+        )])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        self._write([
+            (self._make_key(key, version), self._encode(value), expires, now)
+            for key, value in data.items()
+        ])
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._make_key(key, version)
+        now = time.time()
+        cursor = self._conn.execute(
+            'UPDATE cache SET expires = ?, accessed = ? '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), now, key, now)
+        )
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._make_key(key, version)
+        now = time.time()
+        conn = self._conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or not self._alive(row[1], now):
+                raise ValueError(f"Key '{key}' not found")
+            if not isinstance(row[0], int):
+                raise TypeError(f"Key '{key}' does not hold an integer")
+            conn.execute(
+                'UPDATE cache SET value = value + ?, accessed = ? '
+                'WHERE key = ?',
+                (delta, now, key)
+            )
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return row[0] + delta
+
+    def has_key(self, key, version=None):
+        key = self._make_key(key, version)
+        row = self._conn.execute(
+            'SELECT expires FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        return row is not None and self._alive(row[0], time.time())
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._make_key(key, version) for key in keys]
+        for chunk in _chunks(keys):
+            self._conn.execute(
+                f'DELETE FROM cache WHERE key IN '
+                f'({",".join("?" * len(chunk))})',
+                chunk
+            )
+
+    def clear(self):
+        self._conn.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение живёт весь срок потока: Django вызывает close()
+        # после каждого запроса, и переподключение стоило бы дороже.
+        pass
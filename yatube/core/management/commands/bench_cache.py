@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache import SQLiteCache
+
+
+def bench_set(cache, keys, value):
+    for key in keys:
+        cache.set(key, value)
+
+
+def bench_get(cache, keys, value):
+    for key in keys:
+        cache.get(key)
+
+
+def bench_set_many(cache, batches, value):
+    for chunk in batches:
+        cache.set_many({key: value for key in chunk})
+
+
+def bench_get_many(cache, batches, value):
+    for chunk in batches:
+        cache.get_many(chunk)
+
+
+def bench_incr(cache, keys, value):
+    cache.set('counter', 0)
+    for _ in keys:
+        cache.incr('counter')
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает скорость SQLiteCache с LocMemCache и FileBasedCache '
+        'на типичных для сайта операциях.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ops', type=int, default=2000,
+            help='Число операций каждого вида.'
+        )
+        parser.add_argument(
+            '--batch', type=int, default=10,
+            help='Размер пачки для get_many/set_many (карточек на странице).'
+        )
+        parser.add_argument(
+            '--value-size', type=int, default=4096,
+            help='Размер значения в байтах (отрендеренная карточка).'
+        )
+
+    def backends(self, directory):
+        params = {'OPTIONS': {'MAX_ENTRIES': 100000}}
+        return (
+            ('LocMemCache', LocMemCache('bench', params)),
+            ('FileBasedCache', FileBasedCache(
+                os.path.join(directory, 'files'), params
+            )),
+            ('SQLiteCache', SQLiteCache(
+                os.path.join(directory, 'cache.sqlite3'), params
+            )),
+        )
+
+    def scenarios(self, ops, batch):
+        keys = [f'key:{i}' for i in range(ops)]
+        batches = [
+            keys[start:start + batch] for start in range(0, ops, batch)
+        ]
+        return (
+            ('set', keys, bench_set),
+            ('get', keys, bench_get),
+            ('set_many', batches, bench_set_many),
+            ('get_many', batches, bench_get_many),
+            ('incr', keys, bench_incr),
+        )
+
+    def handle(self, *args, **options):
+        value = 'x' * options['value_size']
+        directory = tempfile.mkdtemp()
+        try:
+            self.stdout.write(
+                f'{"backend":<16}{"operation":<10}{"calls":>8}'
+                f'{"ops/s":>12}{"us/op":>10}'
+            )
+            for name, cache in self.backends(directory):
+                for operation, keys, run in self.scenarios(
+                    options['ops'], options['batch']
+                ):
+                    started = time.perf_counter()
+                    run(cache, keys, value)
+                    elapsed = time.perf_counter() - started
+                    calls = len(keys)
+                    self.stdout.write(
+                        f'{name:<16}{operation:<10}{calls:>8}'
+                        f'{calls / elapsed:>12.0f}'
+                        f'{elapsed / calls * 1e6:>10.1f}'
+                    )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,183 @@
+import bisect
+import threading
+import time
+
+from django.template.backends import django as django_backend
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576)
+
+_local = threading.local()
+
+
+class Histogram:
+    """Гистограмма с накопленными счётчиками, как в Prometheus."""
+
+    def __init__(self, name, documentation, labels, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [
+                [0] * (len(self.buckets) + 1), 0.0
+            ]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def expose(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        bounds = [str(bound) for bound in self.buckets] + ['+Inf']
+        for labels, (counts, total) in sorted(self.series.items()):
+            pairs = [
+                f'{name}="{escape(value)}"'
+                for name, value in zip(self.labels, labels)
+            ]
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                labelset = ','.join(pairs + [f'le="{bound}"'])
+                yield f'{self.name}_bucket{{{labelset}}} {cumulative}'
+            labelset = ','.join(pairs)
+            yield f'{self.name}_sum{{{labelset}}} {total}'
+            yield f'{self.name}_count{{{labelset}}} {cumulative}'
+
+
+def escape(value):
+    return (
+        str(value).replace('\\', r'\\').replace('"', r'\"')
+        .replace('\n', r'\n')
+    )
+
+
+class Registry:
+    """Метрики процесса. Каждый процесс считает свои запросы."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.duration = Histogram(
+            'yatube_request_duration_seconds',
+            'Время обработки запроса.',
+            ('view', 'method', 'status'),
+            LATENCY_BUCKETS
+        )
+        self.queries = Histogram(
+            'yatube_db_queries',
+            'Число SQL-запросов на один запрос к сайту.',
+            ('view',),
+            QUERY_BUCKETS
+        )
+        self.query_time = Histogram(
+            'yatube_db_query_duration_seconds',
+            'Суммарное время SQL-запросов на один запрос к сайту.',
+            ('view',),
+            LATENCY_BUCKETS
+        )
+        self.render_time = Histogram(
+            'yatube_template_render_seconds',
+            'Время рендеринга шаблонов на один запрос к сайту.',
+            ('view',),
+            LATENCY_BUCKETS
+        )
+        self.size = Histogram(
+            'yatube_response_size_bytes',
+            'Размер тела ответа.',
+            ('view',),
+            SIZE_BUCKETS
+        )
+
+    def record(self, stats, view, method, status, size):
+        with self.lock:
+            self.duration.observe((view, method, status), stats.duration)
+            self.queries.observe((view,), stats.queries)
+            self.query_time.observe((view,), stats.query_time)
+            self.render_time.observe((view,), stats.render_time)
+            if size is not None:
+                self.size.observe((view,), size)
+
+    def expose(self):
+        with self.lock:
+            lines = [
+                line
+                for histogram in (
+                    self.duration, self.queries, self.query_time,
+                    self.render_time, self.size
+                )
+                for line in histogram.expose()
+            ]
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class RequestStats:
+    """Счётчики одного запроса; заодно execute_wrapper для SQL."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.queries = 0
+        self.query_time = 0.0
+        self.render_time = 0.0
+        self.render_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_time += time.perf_counter() - started
+            self.queries += 1
+
+
+def current():
+    return getattr(_local, 'stats', None)
+
+
+def activate(stats):
+    _local.stats = stats
+
+
+class TimedTemplate(django_backend.Template):
+    """Шаблон, время рендеринга которого попадает в метрики запроса.
+
+    Вложенный рендеринг (render_to_string внутри тега) не считается
+    повторно: время учитывает только внешний шаблон.
+    """
+
+    def render(self, context=None, request=None):
+        stats = current()
+        if stats is None:
+            return super().render(context, request)
+        stats.render_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.render_depth -= 1
+            if not stats.render_depth:
+                stats.render_time += time.perf_counter() - started
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Стандартный бэкенд шаблонов с замером времени рендеринга."""
+
+    def from_string(self, template_code):
+        template = super().from_string(template_code)
+        return TimedTemplate(template.template, self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
@@ -0,0 +1,39 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from . import metrics
+
+
+class MetricsMiddleware:
+    """Собирает метрики каждого запроса: время ответа, число и время
+    SQL-запросов, время рендеринга шаблонов и размер ответа.
+
+    Ставится первым в MIDDLEWARE, чтобы замер охватывал остальные.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = metrics.RequestStats()
+        metrics.activate(stats)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            metrics.activate(None)
+        stats.duration = time.perf_counter() - stats.started
+
+        match = request.resolver_match
+        metrics.REGISTRY.record(
+            stats,
+            view=match.view_name if match else '<unresolved>',
+            method=request.method,
+            status=response.status_code,
+            size=None if response.streaming else len(response.content)
+        )
+        return response
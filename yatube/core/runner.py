@@ -0,0 +1,32 @@
+import copy
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+class TempCacheRunner(DiscoverRunner):
+    """Запускает тесты с кэшем во временном каталоге.
+
+    Боевой cache.sqlite3 общий для всех процессов хоста: тесты, которые
+    очищают кэш, стёрли бы его и оставили бы в нём свои ключи.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp()
+        caches = copy.deepcopy(settings.CACHES)
+        for alias, cache in caches.items():
+            cache['LOCATION'] = os.path.join(
+                self.cache_dir, f'{alias}.sqlite3'
+            )
+        self.cache_settings = override_settings(CACHES=caches)
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -1,6 +1,15 @@
+import os
+import shutil
+import tempfile
 from http import HTTPStatus
 
-from django.test import TestCase, Client
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from .cache import SQLiteCache
+from .metrics import REGISTRY
 
 
 class CoreTests(TestCase):
@@ -11,3 +20,120 @@ class CoreTests(TestCase):
         response = client.get('/unknown_page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class TestCacheTests(TestCase):
+
+    def test_suite_uses_temporary_cache(self):
+        """Тесты не трогают общий кэш хоста."""
+        location = settings.CACHES['default']['LOCATION']
+        self.assertNotEqual(
+            os.path.dirname(location), str(settings.BASE_DIR)
+        )
+        self.assertTrue(location.startswith(tempfile.gettempdir()))
+
+
+class SQLiteCacheTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_get_set_many(self):
+        """Значения любых типов сохраняются и читаются пачкой."""
+        data = {'int': 1, 'text': 'текст', 'list': [1, {'a': None}]}
+        self.cache.set_many(data)
+        self.assertEqual(self.cache.get_many([*data, 'missing']), data)
+        self.assertEqual(self.cache.get('text'), 'текст')
+        self.assertIsNone(self.cache.get('missing'))
+
+    def test_shared_between_instances(self):
+        """Записи видны другому экземпляру (процессу) с тем же файлом."""
+        other = self.make_cache()
+        self.cache.set('counter', 10)
+        self.assertEqual(other.incr('counter', 5), 15)
+        self.assertEqual(self.cache.get('counter'), 15)
+        self.assertFalse(other.add('counter', 0))
+        self.assertTrue(other.add('fresh', 1))
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_expiry(self):
+        """Просроченные записи не возвращаются."""
+        self.cache.set('old', 1, timeout=-1)
+        self.assertFalse(self.cache.has_key('old'))
+        self.assertTrue(self.cache.add('old', 2))
+        self.assertEqual(self.cache.get('old'), 2)
+
+    def test_lru_eviction(self):
+        """При переполнении вытесняются давно не читанные записи."""
+        cache = self.make_cache(
+            MAX_ENTRIES=4, CULL_FREQUENCY=2, LRU_RESOLUTION=0
+        )
+        for i in range(4):
+            cache.set(f'key{i}', i)
+        cache.get('key0')
+        cache.set('key4', 4)
+        self.assertEqual(
+            sorted(cache.get_many([f'key{i}' for i in range(5)])),
+            ['key0', 'key3', 'key4']
+        )
+
+
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        REGISTRY.clear()
+        self.remote = {'REMOTE_ADDR': '203.0.113.5'}
+
+    @override_settings(METRICS_ALLOWED_IPS=['127.0.0.1'])
+    def test_requests_are_measured(self):
+        """Запросы попадают в гистограммы с именем представления."""
+        client = Client()
+        client.get(reverse('posts:index'))
+        client.get(reverse('posts:index'))
+        client.get('/unknown_page/')
+        body = client.get(reverse('metrics')).content.decode()
+        for line in (
+            'yatube_request_duration_seconds_count'
+            '{view="posts:index",method="GET",status="200"} 2',
+            'yatube_request_duration_seconds_count'
+            '{view="<unresolved>",method="GET",status="404"} 1',
+            'yatube_db_queries_count{view="posts:index"} 2',
+            'yatube_template_render_seconds_count{view="posts:index"} 2',
+            'yatube_response_size_bytes_bucket'
+            '{view="posts:index",le="+Inf"} 2',
+        ):
+            with self.subTest(line=line):
+                self.assertIn(line, body)
+
+    def test_access(self):
+        """Метрики видят только персонал и адреса METRICS_ALLOWED_IPS;
+        запросы через локальный прокси по умолчанию не пускаются."""
+        client = Client()
+        self.assertEqual(
+            client.get(reverse('metrics')).status_code, HTTPStatus.FORBIDDEN
+        )
+        with self.settings(METRICS_ALLOWED_IPS=['127.0.0.1']):
+            self.assertEqual(
+                client.get(reverse('metrics')).status_code, HTTPStatus.OK
+            )
+            self.assertEqual(
+                client.get(reverse('metrics'), **self.remote).status_code,
+                HTTPStatus.FORBIDDEN
+            )
+        staff = get_user_model().objects.create_user(
+            username='staff', is_staff=True
+        )
+        client.force_login(staff)
+        self.assertEqual(
+            client.get(reverse('metrics'), **self.remote).status_code,
+            HTTPStatus.OK
+        )
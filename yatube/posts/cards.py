@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.template.loader import render_to_string
+
+from . import thumbnails
+from .models import Group, Post
+from .utils import attach_comment_previews
+
+CARD_TEMPLATE = 'includes/post_elements.html'
+
+
+def card_key(post, author_posts, groups):
+    """Ключ кэша карточки: версии поста и группы берутся из строк БД,
+    поэтому для сборки ключей не нужны дополнительные запросы.
+    Дата публикации отличает пост от удалённого с тем же id.
+    """
+    group_version = post.group.cache_version if post.group_id else 0
+    return (
+        f'post-card:{post.pk}:{post.pub_date.timestamp()}:'
+        f'{post.cache_version}:{group_version}:'
+        f'{int(bool(author_posts))}{int(bool(groups))}'
+    )
+
+
+def bump_post(post_id):
+    Post.objects.filter(pk=post_id).update(
+        cache_version=F('cache_version') + 1
+    )
+
+
+def bump_group(group_id):
+    Group.objects.filter(pk=group_id).update(
+        cache_version=F('cache_version') + 1
+    )
+
+
+def render_cards(posts, author_posts=False, groups=False):
+    """Возвращает HTML карточек постов страницы.
+
+    Готовые карточки достаются из кэша одним get_many, недостающие
+    рендерятся и сохраняются одним set_many. Миниатюры и превью
+    комментариев для них ищутся тоже разом, а не по запросу на карточку;
+    для карточек из кэша их не ищут вовсе.
+    """
+    keys = [card_key(post, author_posts, groups) for post in posts]
+    cached = cache.get_many(keys)
+    stale = [
+        (key, post) for key, post in zip(keys, posts) if key not in cached
+    ]
+    attach_comment_previews([post for _, post in stale])
+    variants = thumbnails.ready_variants_many(
+        [post.image for _, post in stale if post.image]
+    )
+    missing = {}
+    for key, post in stale:
+        missing[key] = render_to_string(CARD_TEMPLATE, {
+            'post': post,
+            'author_posts': author_posts,
+            'groups': groups,
+            'image_variants': variants.get(post.image.name, {}),
+        })
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_CACHE_TIMEOUT)
+        cached.update(missing)
+    return [cached[key] for key in keys]
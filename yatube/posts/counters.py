@@ -0,0 +1,139 @@
+from django.db import IntegrityError
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Greatest
+
+from .models import AuthorStats, Follow, Group, Post, User
+
+STATS_FIELDS = ('posts_count', 'followers_count', 'following_count')
+
+
+def _update(queryset, **deltas):
+    # Счётчики не уходят в минус, даже если успели разойтись с данными.
+    queryset = queryset.filter(**{
+        f'{field}__gte': -delta
+        for field, delta in deltas.items() if delta < 0
+    })
+    return queryset.update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+
+
+def bump_author(user_id, **deltas):
+    """Атомарно меняет счётчики автора на заданные приращения.
+
+    Строка счётчиков создаётся только при увеличении: уменьшение для
+    отсутствующей строки (например, при удалении пользователя) пропускается.
+    """
+    stats = AuthorStats.objects.filter(user_id=user_id)
+    if _update(stats, **deltas) or min(deltas.values()) < 0:
+        return
+    try:
+        AuthorStats.objects.get_or_create(user_id=user_id)
+    except IntegrityError:
+        # Пользователь удалён параллельно.
+        return
+    _update(stats, **deltas)
+
+
+def bump_comments(post_id, delta):
+    # Карточка поста показывает комментарии, поэтому вместе со счётчиком
+    # меняется и версия её кэша.
+    _update(
+        Post.objects.filter(pk=post_id),
+        comments_count=delta,
+        cache_version=1
+    )
+
+
+def latest_group_post():
+    """Подзапрос id последнего поста группы, идёт по индексу (group,
+    pub_date)."""
+    return Subquery(Post.objects.filter(
+        group=OuterRef('pk')
+    ).order_by('-pub_date', '-pk').values('pk')[:1])
+
+
+def bump_group(group_id, delta, latest_post_id=None):
+    """Меняет число постов группы и её последний пост одним UPDATE.
+
+    Новый пост - всегда последний в группе, его id передаётся явно.
+    После удаления или переноса поста последний ищется подзапросом.
+    """
+    Group.objects.filter(pk=group_id).update(
+        posts_count=Greatest(F('posts_count') + delta, 0),
+        latest_post=latest_post_id or latest_group_post()
+    )
+
+
+def repair_posts():
+    """Исправляет разошедшиеся счётчики комментариев, возвращает их число."""
+    drifted = Post.objects.annotate(
+        actual=Count('comments')
+    ).exclude(
+        comments_count=F('actual')
+    ).values_list('pk', 'actual')
+    repaired = 0
+    for post_id, actual in drifted.iterator():
+        Post.objects.filter(pk=post_id).update(comments_count=actual)
+        repaired += 1
+    return repaired
+
+
+def repair_groups():
+    """Исправляет разошедшиеся счётчики групп, возвращает их число."""
+    drifted = Group.objects.annotate(
+        actual=Count('group_posts'), actual_latest=latest_group_post()
+    ).values_list(
+        'pk', 'posts_count', 'latest_post', 'actual', 'actual_latest'
+    )
+    repaired = 0
+    for group_id, count, latest, actual, actual_latest in drifted.iterator():
+        if (count, latest) != (actual, actual_latest):
+            Group.objects.filter(pk=group_id).update(
+                posts_count=actual, latest_post=actual_latest
+            )
+            repaired += 1
+    return repaired
+
+
+def _counts(queryset, field, user_ids):
+    return dict(
+        queryset.filter(**{f'{field}__in': user_ids}).order_by().values(
+            field
+        ).annotate(total=Count('pk')).values_list(field, 'total')
+    )
+
+
+def repair_authors(batch_size=1000):
+    """Пересчитывает счётчики авторов пачками, возвращает число правок."""
+    user_ids = list(User.objects.values_list('pk', flat=True))
+    repaired = 0
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        actual = {
+            'posts_count': _counts(Post.objects, 'author', batch),
+            'followers_count': _counts(Follow.objects, 'author', batch),
+            'following_count': _counts(Follow.objects, 'user', batch),
+        }
+        stored = {
+            stats['user']: stats
+            for stats in AuthorStats.objects.filter(
+                user__in=batch
+            ).values('user', *STATS_FIELDS)
+        }
+        for user_id in batch:
+            values = {
+                field: actual[field].get(user_id, 0)
+                for field in STATS_FIELDS
+            }
+            current = stored.get(user_id)
+            if current is None and not any(values.values()):
+                continue
+            if current is None or any(
+                current[field] != value for field, value in values.items()
+            ):
+                AuthorStats.objects.update_or_create(
+                    user_id=user_id, defaults=values
+                )
+                repaired += 1
+    return repaired
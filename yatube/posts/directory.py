@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.template.loader import render_to_string
+
+from . import etags
+from .models import Group
+
+PAGE_KEY = 'groups:page:{}:{}'
+TEMPLATE = 'includes/group_directory.html'
+
+
+def groups():
+    """Группы каталога со счётчиками и последним постом, одним запросом.
+
+    Число постов и последний пост поддерживают сигналы (см.
+    counters.bump_group), поэтому агрегировать посты не нужно, а
+    сортировка идёт по индексу названия.
+    """
+    return Group.objects.select_related('latest_post').only(
+        'title', 'slug', 'description', 'posts_count',
+        'latest_post__text', 'latest_post__pub_date'
+    ).order_by('title', 'pk')
+
+
+def render_page(number):
+    """HTML страницы каталога; рендерится один раз на метку области
+    etags.GROUPS, которую сигналы меняют при записи групп и их постов.
+    """
+    number = int(number) if str(number).isdigit() else 1
+    key = PAGE_KEY.format(etags.changed([etags.GROUPS]), number)
+    html = cache.get(key)
+    if html is None:
+        page_obj = Paginator(groups(), settings.GROUPS_ON_PAGE).get_page(
+            number
+        )
+        html = render_to_string(TEMPLATE, {'page_obj': page_obj})
+        cache.set(key, html, settings.GROUP_DIRECTORY_CACHE_TIMEOUT)
+    return html
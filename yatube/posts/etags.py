@@ -0,0 +1,145 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from . import follows
+from .models import Post
+
+ALL = '*'
+INDEX = 'index'
+GROUPS = 'groups'
+VERSION_KEY = 'etags:version:{}'
+POST_AUTHOR_KEY = 'etags:post-author:{}'
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def author_scope(username):
+    return f'author:{username}'
+
+
+def feed_scopes(username, slug):
+    """Ленты, в которые попадает пост с таким автором и группой."""
+    scopes = [INDEX, author_scope(username)]
+    if slug:
+        scopes.append(group_scope(slug))
+    return scopes
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def user_scope(user_id):
+    """Посты автора и комментарии к ним: из неё ленты подписчиков."""
+    return f'user:{user_id}'
+
+
+def follow_scope(user_id):
+    """Подписки пользователя: от них его лента и рекомендации."""
+    return f'follow:{user_id}'
+
+
+def post_scopes(post_id, author_id, username, slug):
+    """Страницы, на которых виден пост: ленты, профиль, сам пост."""
+    scopes = feed_scopes(username, slug) + [
+        post_scope(post_id), user_scope(author_id)
+    ]
+    if slug:
+        scopes.append(GROUPS)
+    return scopes
+
+
+def stored_post_scopes(post_id):
+    """post_scopes поста по его id, одним запросом."""
+    post = Post.objects.filter(pk=post_id).values_list(
+        'author_id', 'author__username', 'group__slug'
+    ).first()
+    return post_scopes(post_id, *post) if post else [post_scope(post_id)]
+
+
+def touch(*scopes):
+    """Отмечает изменение контента в областях ``scopes``, без них - везде.
+
+    Метка обновляется сразу и ещё раз после коммита: иначе запрос,
+    успевший между ними прочитать старые данные, закрепил бы их за новой
+    меткой.
+    """
+    def bump():
+        changed = time.time_ns()
+        cache.set_many(
+            {VERSION_KEY.format(scope): changed for scope in scopes or [ALL]},
+            None
+        )
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def changed(scopes):
+    """Метка последнего изменения в любой из областей, в наносекундах."""
+    keys = [VERSION_KEY.format(scope) for scope in (ALL, *scopes)]
+    stamps = cache.get_many(keys)
+    for key in keys:
+        if key not in stamps:
+            stamps[key] = time.time_ns()
+            if not cache.add(key, stamps[key], None):
+                stamps[key] = cache.get(key, stamps[key])
+    return max(stamps.values())
+
+
+def scoped_etag(scopes):
+    """Функция ETag для etag(): ``scopes(request, **kwargs)`` называет
+    области, от которых зависит страница.
+
+    В ETag входят метка этих областей, зритель, ключ его сессии и адрес
+    с курсором. Ключ сессии меняется при входе вместе с CSRF-токеном,
+    поэтому страница с формой из прошлой сессии не отдаётся ответом 304.
+    Запись в другой области ETag не меняет.
+    """
+    def page_etag(request, *args, **kwargs):
+        raw = '|'.join(map(str, (
+            changed(scopes(request, **kwargs)),
+            request.user.pk,
+            request.session.session_key,
+            request.get_full_path(),
+        )))
+        return hashlib.md5(raw.encode()).hexdigest()
+    return page_etag
+
+
+def _viewer(request):
+    user = request.user
+    return [follow_scope(user.pk)] if user.is_authenticated else []
+
+
+def _post_author(post_id):
+    # Автор поста не меняется: id запоминается навсегда.
+    key = POST_AUTHOR_KEY.format(post_id)
+    author_id = cache.get(key)
+    if author_id is None:
+        author_id = Post.objects.filter(pk=post_id).values_list(
+            'author_id', flat=True
+        ).first()
+        if author_id is not None:
+            cache.set(key, author_id, None)
+    return author_id
+
+
+index_etag = scoped_etag(lambda request: [INDEX])
+groups_etag = scoped_etag(lambda request: [GROUPS])
+group_etag = scoped_etag(lambda request, slug: [group_scope(slug)])
+profile_etag = scoped_etag(
+    lambda request, username: [author_scope(username), *_viewer(request)]
+)
+post_etag = scoped_etag(lambda request, post_id: [
+    post_scope(post_id), user_scope(_post_author(post_id))
+])
+follow_etag = scoped_etag(lambda request: [
+    *_viewer(request),
+    *map(user_scope, follows.following(request.user)),
+])
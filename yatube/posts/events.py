@@ -0,0 +1,157 @@
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+SEQUENCE_KEY = 'events:sequence'
+ENTRY_KEY = 'events:entry:{}'
+
+
+def append(post):
+    """Дописывает новый пост в журнал изменений.
+
+    Журнал лежит в общем кэше, поэтому его видят потоки всех процессов.
+    Номер записи выдаёт атомарный incr.
+    """
+    try:
+        sequence = cache.incr(SEQUENCE_KEY)
+    except ValueError:
+        cache.add(SEQUENCE_KEY, 0, None)
+        sequence = cache.incr(SEQUENCE_KEY)
+    cache.set(
+        ENTRY_KEY.format(sequence),
+        (post.pk, post.author_id, post.group_id),
+        settings.EVENTS_LOG_TIMEOUT
+    )
+
+
+def last_sequence():
+    return cache.get(SEQUENCE_KEY, 0)
+
+
+def read(since):
+    """Номер последней записи журнала и записи после ``since``.
+
+    Номер выдаётся раньше, чем запись попадает в кэш, поэтому
+    отсутствующие записи в конце журнала не читаются до следующего
+    опроса. Просматривается не больше EVENTS_LOG_SIZE последних записей.
+    """
+    sequence = last_sequence()
+    if sequence <= since:
+        # Номер меньше since, если журнал вытеснен из кэша и начат заново.
+        return sequence, []
+    start = max(since, sequence - settings.EVENTS_LOG_SIZE)
+    keys = [ENTRY_KEY.format(n) for n in range(start + 1, sequence + 1)]
+    entries = cache.get_many(keys)
+    while keys and keys[-1] not in entries:
+        keys.pop()
+        sequence -= 1
+    return sequence, [entries[key] for key in keys if key in entries]
+
+
+def lease_timeout():
+    return settings.SSE_STREAM_SECONDS + settings.SSE_KEEPALIVE
+
+
+class Lease:
+    """Место потока в общем кэше, помеченное своим токеном."""
+
+    def __init__(self, key, token):
+        self.key = key
+        self.token = token
+
+    def renew(self):
+        # Продление заодно обновляет время обращения: LRU кэша не
+        # вытесняет места живых потоков.
+        cache.touch(self.key, lease_timeout())
+
+    def release(self):
+        # Место могло истечь и достаться другому потоку: чужое не удаляется.
+        if cache.get(self.key) == self.token:
+            cache.delete(self.key)
+
+
+class Slots:
+    """Места для потоков на всех процессах хоста.
+
+    Каждый поток занимает поток WSGI-сервера на всё время подключения,
+    поэтому их число ограничено SSE_MAX_CONNECTIONS: остальные потоки
+    сервера остаются обычным запросам. Место - ключ кэша из
+    SSE_MAX_CONNECTIONS возможных, занимаемый атомарным add, поэтому
+    предел общий для всех воркеров. Ключ живёт чуть дольше потока, и
+    место воркера, убитого посреди потока, освобождается само.
+    """
+
+    KEY = 'events:slot:{}'
+
+    def acquire(self):
+        """Lease свободного места или None, если мест нет."""
+        token = uuid.uuid4().hex
+        for number in range(settings.SSE_MAX_CONNECTIONS):
+            key = self.KEY.format(number)
+            if cache.add(key, token, lease_timeout()):
+                return Lease(key, token)
+        return None
+
+
+SLOTS = Slots()
+
+
+def _event(sequence, count):
+    data = json.dumps({'count': count})
+    return f'id: {sequence}\nevent: new-posts\ndata: {data}\n\n'
+
+
+class EventStream:
+    """Поток SSE с числом новых постов ленты.
+
+    ``matches`` решает, попадает ли запись журнала (id поста, id автора,
+    id группы) в ленту. Журнал опрашивается раз в SSE_POLL_INTERVAL
+    секунд; молчание прерывается комментарием, чтобы отключившийся
+    клиент обнаружился. Через SSE_STREAM_SECONDS после открытия поток
+    закрывается, и браузер переподключается с Last-Event-ID. Место
+    ``lease`` продлевается при каждом опросе и освобождается в close(),
+    который сервер вызывает всегда, даже если поток не начинали читать.
+    """
+
+    def __init__(self, matches, since, lease):
+        self.matches = matches
+        self.since = since
+        self.lease = lease
+        self.deadline = time.monotonic() + settings.SSE_STREAM_SECONDS
+        self.closed = False
+
+    def __iter__(self):
+        yield f'retry: {settings.SSE_RETRY_MS}\n\n'
+        keepalive = time.monotonic() + settings.SSE_KEEPALIVE
+        while True:
+            self.lease.renew()
+            self.since, entries = read(self.since)
+            count = sum(1 for entry in entries if self.matches(entry))
+            now = time.monotonic()
+            if count:
+                keepalive = now + settings.SSE_KEEPALIVE
+                yield _event(self.since, count)
+            elif now >= keepalive:
+                keepalive = now + settings.SSE_KEEPALIVE
+                yield ': ping\n\n'
+            if now >= self.deadline:
+                return
+            time.sleep(settings.SSE_POLL_INTERVAL)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.lease.release()
+
+
+def open_stream(matches, since=None):
+    """EventStream или None, если свободных мест нет."""
+    lease = SLOTS.acquire()
+    if lease is None:
+        return None
+    return EventStream(
+        matches, last_sequence() if since is None else since, lease
+    )
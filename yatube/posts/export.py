@@ -0,0 +1,49 @@
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Comment
+
+encoder = DjangoJSONEncoder(ensure_ascii=False)
+
+
+def _line(record):
+    return encoder.encode(record) + '\n'
+
+
+def export_lines(author, image_url):
+    """Строки NDJSON с постами и комментариями автора.
+
+    Формат совпадает с тем, что читает import_archive. Записи выбираются
+    итератором пачками EXPORT_CHUNK_SIZE, поэтому память не зависит от
+    числа постов. ``image_url`` превращает имя файла в полный адрес.
+    """
+    posts = author.posts.order_by('pk').values_list(
+        'pk', 'group__slug', 'text', 'pub_date', 'image'
+    )
+    for pk, group, text, pub_date, image in posts.iterator(
+        chunk_size=settings.EXPORT_CHUNK_SIZE
+    ):
+        yield _line({
+            'type': 'post',
+            'id': pk,
+            'author': author.username,
+            'group': group,
+            'text': text,
+            'pub_date': pub_date,
+            'image': image,
+            'image_url': image_url(image) if image else None,
+        })
+    comments = Comment.objects.filter(author=author).order_by(
+        'pk'
+    ).values_list('post_id', 'text', 'created')
+    for post_id, text, created in comments.iterator(
+        chunk_size=settings.EXPORT_CHUNK_SIZE
+    ):
+        yield _line({
+            'type': 'comment',
+            'post': post_id,
+            'author': author.username,
+            'text': text,
+            'created': created,
+        })
@@ -0,0 +1,143 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.http import http_date, quote_etag
+from django.utils.text import Truncator
+
+from . import etags
+from .models import Group, Post, User
+
+BODY_KEY = 'feeds:body:{}:{}:{}'
+
+
+class CachedFeed(Feed):
+    """Лента, тело которой рендерится один раз на версию.
+
+    Версия ленты - метка её области в etags: она меняется при записи
+    поста в этой области, поэтому ETag и Last-Modified считаются по
+    одному обращению к кэшу, а опрашивающие клиенты получают 304 без
+    запросов к БД.
+    """
+
+    def scope(self, **kwargs):
+        return etags.INDEX
+
+    def __call__(self, request, *args, **kwargs):
+        scope = self.scope(**kwargs)
+        version = etags.changed([scope])
+        name = type(self).__name__
+        etag = quote_etag(
+            hashlib.md5(f'{name}|{scope}|{version}'.encode()).hexdigest()
+        )
+        last_modified = version // 10 ** 9
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            key = BODY_KEY.format(name, scope, version)
+            cached = cache.get(key)
+            if cached is None:
+                rendered = super().__call__(request, *args, **kwargs)
+                cached = (rendered.content, rendered['Content-Type'])
+                cache.set(key, cached, settings.FEED_CACHE_TIMEOUT)
+            response = HttpResponse(cached[0], content_type=cached[1])
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def item_title(self, post):
+        return Truncator(post.text).words(10)
+
+    def item_description(self, post):
+        return post.text
+
+    def item_pubdate(self, post):
+        return post.pub_date
+
+    def item_author_name(self, post):
+        return post.author.get_full_name() or post.author.username
+
+    def item_link(self, post):
+        return reverse('posts:post_detail', kwargs={'post_id': post.pk})
+
+    def posts(self, queryset):
+        return queryset.select_related('author')[:settings.FEED_ITEMS]
+
+
+class IndexFeed(CachedFeed):
+    title = 'Yatube: последние записи'
+    description = 'Новые посты всех авторов.'
+
+    def link(self):
+        return reverse('posts:index')
+
+    def items(self):
+        return self.posts(Post.objects.all())
+
+
+class GroupFeed(CachedFeed):
+
+    def scope(self, slug):
+        return etags.group_scope(slug)
+
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, group):
+        return f'Yatube: {group.title}'
+
+    def description(self, group):
+        return group.description
+
+    def link(self, group):
+        return reverse('posts:group_list', kwargs={'slug': group.slug})
+
+    def items(self, group):
+        return self.posts(group.group_posts.all())
+
+
+class AuthorFeed(CachedFeed):
+
+    def scope(self, username):
+        return etags.author_scope(username)
+
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, author):
+        return f'Yatube: {author.get_full_name() or author.username}'
+
+    def description(self, author):
+        return f'Посты пользователя {author.username}.'
+
+    def link(self, author):
+        return reverse('posts:profile', kwargs={'username': author.username})
+
+    def items(self, author):
+        return self.posts(author.posts.all())
+
+
+class IndexAtomFeed(IndexFeed):
+    feed_type = Atom1Feed
+    subtitle = IndexFeed.description
+
+
+class GroupAtomFeed(GroupFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, group):
+        return group.description
+
+
+class AuthorAtomFeed(AuthorFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, author):
+        return self.description(author)
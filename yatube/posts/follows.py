@@ -0,0 +1,81 @@
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Follow
+
+KEY = 'follow-graph:{}'
+# id пользователей в кэше - массив 8-байтовых целых, а не pickle списка.
+TYPECODE = 'q'
+
+
+class Following:
+    """Отсортированные id авторов, на которых подписан пользователь."""
+
+    def __init__(self, ids):
+        self.ids = ids
+
+    def __contains__(self, author_id):
+        index = bisect_left(self.ids, author_id)
+        return index < len(self.ids) and self.ids[index] == author_id
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def _decode(raw):
+    ids = array(TYPECODE)
+    ids.frombytes(raw)
+    return ids
+
+
+def _store(user_id, ids):
+    cache.set(
+        KEY.format(user_id), ids.tobytes(), settings.FOLLOW_GRAPH_TIMEOUT
+    )
+
+
+def _load(user_id):
+    ids = array(TYPECODE, Follow.objects.filter(user_id=user_id).order_by(
+        'author_id'
+    ).values_list('author_id', flat=True))
+    _store(user_id, ids)
+    return ids
+
+
+def following(user):
+    """Подписки пользователя из кэша, при промахе - одним запросом.
+
+    Результат запоминается на объекте пользователя, поэтому за один
+    запрос к сайту граф читается не больше одного раза.
+    """
+    if not user.is_authenticated:
+        return Following(array(TYPECODE))
+    result = getattr(user, '_following', None)
+    if result is None:
+        raw = cache.get(KEY.format(user.pk))
+        ids = _load(user.pk) if raw is None else _decode(raw)
+        result = user._following = Following(ids)
+    return result
+
+
+def invalidate(user_id):
+    """Сбрасывает граф подписок пользователя: следующее чтение загрузит
+    его заново одним запросом.
+
+    Граф не правится на месте: чтение и запись массива без блокировки
+    теряли одновременные подписки. Ключ удаляется сразу и ещё раз после
+    коммита, как в etags.touch: иначе запрос, прочитавший граф
+    до коммита, вернул бы в кэш старые подписки.
+    """
+    def drop():
+        cache.delete(KEY.format(user_id))
+
+    drop()
+    transaction.on_commit(drop)
@@ -0,0 +1,88 @@
+import itertools
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.search import FTS_SCHEMA, FTS_TABLE, FTS_TRIGGERS, match_expression
+
+# Частоты слов в текстах распределены по Ципфу: немногие слова
+# встречаются почти везде, большинство - редко. Искать имеет смысл
+# как раз редкие, иначе LIKE находит десяток строк сразу и
+# сравнение теряет смысл.
+VOCABULARY = [f'слово{i}' for i in range(50000)]
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает поиск LIKE и FTS5 MATCH на синтетической таблице '
+        'постов во временной базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=1000000,
+            help='Число синтетических постов.'
+        )
+        parser.add_argument(
+            '--queries', type=int, default=20,
+            help='Число запросов каждого вида.'
+        )
+
+    def populate(self, conn, count):
+        conn.execute(
+            'CREATE TABLE posts_post (id INTEGER PRIMARY KEY, text TEXT)'
+        )
+        cum_weights = list(itertools.accumulate(WEIGHTS))
+        for statement in FTS_SCHEMA + FTS_TRIGGERS:
+            conn.execute(statement)
+        rows = (
+            (' '.join(random.choices(
+                VOCABULARY, cum_weights=cum_weights, k=random.randint(5, 40)
+            )),)
+            for _ in range(count)
+        )
+        conn.executemany('INSERT INTO posts_post (text) VALUES (?)', rows)
+        conn.commit()
+
+    def measure(self, conn, sql, params, queries):
+        started = time.perf_counter()
+        for term in params[:queries]:
+            conn.execute(sql, term).fetchall()
+        return (time.perf_counter() - started) / queries * 1000
+
+    def handle(self, *args, **options):
+        handle, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        try:
+            conn = sqlite3.connect(path)
+            started = time.perf_counter()
+            self.populate(conn, options['posts'])
+            self.stdout.write(
+                f'Постов: {options["posts"]}, заполнение и индексация: '
+                f'{time.perf_counter() - started:.1f} с'
+            )
+            terms = random.sample(VOCABULARY[100:5000], options['queries'])
+            like = self.measure(
+                conn,
+                'SELECT id FROM posts_post WHERE text LIKE ? '
+                'ORDER BY id DESC LIMIT 10',
+                [(f'%{term}%',) for term in terms],
+                options['queries']
+            )
+            fts = self.measure(
+                conn,
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ? '
+                f'ORDER BY rank LIMIT 10',
+                [(match_expression(term),) for term in terms],
+                options['queries']
+            )
+            self.stdout.write(f'{"LIKE":<8}{like:>10.1f} мс/запрос')
+            self.stdout.write(f'{"FTS5":<8}{fts:>10.1f} мс/запрос')
+            conn.close()
+        finally:
+            os.remove(path)
@@ -0,0 +1,247 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from collections import Counter
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Group, Post, User
+
+
+def percentile(values, share):
+    """Процентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    index = max(int(round(share * len(ordered))) - 1, 0)
+    return ordered[index]
+
+
+def commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет страницы posts тестовым клиентом на синтетических данных '
+        'нескольких размеров и сохраняет результаты в JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='1000,10000',
+            help='Размеры данных в постах через запятую.'
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--output', default=None,
+            help='Файл результатов, по умолчанию bench_views-<коммит>.json.'
+        )
+        parser.add_argument(
+            '--compare', default=None,
+            help='Файл прошлого прогона для сравнения p50.'
+        )
+
+    def populate(self, size, seed):
+        call_command('flush', interactive=False, verbosity=0)
+        call_command(
+            'generate_dataset',
+            users=max(size // 10, 10),
+            groups=20,
+            posts=size,
+            comments=size * 3,
+            seed=seed,
+            stdout=StringIO()
+        )
+
+    def deep_cursor(self, url, pages):
+        """Курсор страницы ``pages + 1`` ленты.
+
+        Большая лента листается курсором, и ``?page=`` в ней ничего не
+        значит: курсор берётся из next_cursor эндпоинта карточек,
+        начиная с первой страницы.
+        """
+        client = Client()
+        cursor = None
+        for _ in range(pages):
+            response = client.get(url, {'cursor': cursor} if cursor else {})
+            cursor = response.json()['next_cursor']
+            if cursor is None:
+                raise CommandError(f'{url}: в ленте меньше {pages + 1} стр.')
+        return cursor
+
+    def cases(self):
+        """Страницы для замера: самые тяжёлые представители каждого вида.
+
+        Потоки SSE (*_events) не замеряются: они открыты до
+        SSE_STREAM_SECONDS. Запись (комментарии, подписки) идёт POST-ом
+        и в замер страниц не входит.
+        """
+        author = User.objects.annotate(
+            total=Count('posts')
+        ).order_by('-total').first()
+        reader = User.objects.annotate(
+            total=Count('follower')
+        ).order_by('-total').first()
+        group = Group.objects.annotate(
+            total=Count('group_posts')
+        ).order_by('-total').first()
+        post = Post.objects.order_by('-comments_count').first()
+        word = Counter(
+            word for text in Post.objects.values_list('text', flat=True)[:200]
+            for word in text.lower().split() if len(word) > 4
+        ).most_common(1)[0][0].strip('.,')
+        slug = {'slug': group.slug}
+        username = {'username': author.username}
+        post_id = {'post_id': post.pk}
+        deep = self.deep_cursor(reverse('posts:index_cards'), 4)
+        return (
+            ('index', reverse('posts:index'), None),
+            ('index_page_5', reverse('posts:index') + f'?cursor={deep}', None),
+            ('index_cards', reverse('posts:index_cards'), None),
+            ('index_rss', reverse('posts:index_rss'), None),
+            ('trending', reverse('posts:trending'), None),
+            ('groups', reverse('posts:groups'), None),
+            ('group_list', reverse('posts:group_list', kwargs=slug), None),
+            ('group_cards', reverse('posts:group_cards', kwargs=slug), None),
+            ('group_rss', reverse('posts:group_rss', kwargs=slug), None),
+            ('profile', reverse('posts:profile', kwargs=username), None),
+            ('profile_cards', reverse(
+                'posts:profile_cards', kwargs=username
+            ), None),
+            ('profile_rss', reverse(
+                'posts:profile_rss', kwargs=username
+            ), None),
+            ('post_detail', reverse(
+                'posts:post_detail', kwargs=post_id
+            ), None),
+            ('follow_index', reverse('posts:follow_index'), reader),
+            ('follow_cards', reverse('posts:follow_cards'), reader),
+            ('search', reverse('posts:search') + f'?q={word}', None),
+            ('export', reverse('posts:export'), author),
+            ('post_create', reverse('posts:post_create'), author),
+            ('post_edit', reverse(
+                'posts:post_edit', kwargs=post_id
+            ), post.author),
+            ('api_index', reverse('api:index'), None),
+            ('api_group_list', reverse('api:group_list', kwargs=slug), None),
+            ('api_profile', reverse('api:profile', kwargs=username), None),
+            ('api_post_detail', reverse(
+                'api:post_detail', kwargs=post_id
+            ), None),
+            ('api_follow_index', reverse('api:follow_index'), reader),
+        )
+
+    def measure(self, url, user, repeat, warmup):
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        for _ in range(warmup):
+            client.get(url)
+        latencies, queries, query_time = [], [], []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(url)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f'{url}: ответ {response.status_code}')
+            queries.append(len(captured))
+            query_time.append(
+                sum(float(query['time']) for query in captured) * 1000
+            )
+        return {
+            'p50_ms': round(percentile(latencies, 0.5), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'queries': max(queries),
+            'query_ms': round(percentile(query_time, 0.5), 2),
+        }
+
+    def report(self, size, name, stats, previous):
+        line = (
+            f'{size:>8}  {name:<18}{stats["p50_ms"]:>9.1f}'
+            f'{stats["p95_ms"]:>9.1f}{stats["queries"]:>9}'
+            f'{stats["query_ms"]:>10.1f}'
+        )
+        before = previous.get(str(size), {}).get(name)
+        if before:
+            change = stats['p50_ms'] / before['p50_ms'] - 1
+            line += f'{change:>+9.0%}'
+        self.stdout.write(line)
+
+    def run(self, sizes, options, previous):
+        results = {}
+        for size in sizes:
+            self.populate(size, options['seed'])
+            results[str(size)] = {}
+            for name, url, user in self.cases():
+                stats = self.measure(
+                    url, user, options['repeat'], options['warmup']
+                )
+                results[str(size)][name] = stats
+                self.report(size, name, stats, previous)
+        return results
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        previous = {}
+        if options['compare']:
+            with open(options['compare']) as source:
+                previous = json.load(source)['results']
+        revision = commit()
+        directory = tempfile.mkdtemp()
+        settings_dict = connection.settings_dict
+        settings_dict['TEST']['NAME'] = os.path.join(directory, 'db.sqlite3')
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True
+        )
+        try:
+            with override_settings(
+                MEDIA_ROOT=os.path.join(directory, 'media'),
+                CACHES={'default': {
+                    'BACKEND': 'core.cache.SQLiteCache',
+                    'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+                }},
+                THUMBNAIL_WORKERS=0,
+                DEBUG=False
+            ):
+                self.stdout.write(
+                    f'{"posts":>8}  {"view":<18}{"p50 ms":>9}{"p95 ms":>9}'
+                    f'{"queries":>9}{"query ms":>10}'
+                    + (f'{"p50 Δ":>9}' if previous else '')
+                )
+                results = self.run(sizes, options, previous)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            shutil.rmtree(directory, ignore_errors=True)
+
+        output = options['output'] or f'bench_views-{revision}.json'
+        with open(output, 'w') as target:
+            json.dump({
+                'commit': revision,
+                'created': timezone.now().isoformat(),
+                'repeat': options['repeat'],
+                'results': results,
+            }, target, indent=2, ensure_ascii=False)
+        self.stdout.write(
+            self.style.SUCCESS(f'Результаты записаны в {output}')
+        )
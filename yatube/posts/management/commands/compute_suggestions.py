@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import etags
+from posts.suggestions import compute_suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рекомендации «на кого подписаться» для всех '
+        'пользователей. Запускается периодически, например из cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=settings.SUGGESTIONS_TOP,
+            help='Сколько авторов рекомендовать каждому пользователю.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Для скольких пользователей заменять записи за транзакцию.'
+        )
+
+    def handle(self, *args, **options):
+        written = compute_suggestions(options['top'], options['batch_size'])
+        # Боковая панель входит в страницы с ETag.
+        etags.touch()
+        self.stdout.write(self.style.SUCCESS(
+            f'Рекомендаций записано: {written}'
+        ))
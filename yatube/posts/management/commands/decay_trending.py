@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from posts import etags, trending
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет затухшие счета популярности. Запускается периодически, '
+        'например из cron; порядок ленты от запуска не зависит.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Пересчитать счета по комментариям с нуля.'
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            kept = trending.rebuild()
+            etags.touch()
+            self.stdout.write(self.style.SUCCESS(
+                f'Счета пересчитаны, популярных постов: {kept}'
+            ))
+            return
+        deleted = trending.prune()
+        if deleted:
+            etags.touch()
+        self.stdout.write(self.style.SUCCESS(
+            f'Затухших счетов удалено: {deleted}'
+        ))
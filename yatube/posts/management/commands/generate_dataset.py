@@ -0,0 +1,191 @@
+import itertools
+import os
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+
+from posts import etags
+from posts.models import Comment, Follow, Group, Post, User
+from posts.utils import batches
+
+IMAGES = 20
+
+
+def zipf_weights(count, exponent=1.0):
+    """Накопленные веса Ципфа: первые элементы выбираются чаще всех."""
+    return list(itertools.accumulate(
+        1 / (rank + 1) ** exponent for rank in range(count)
+    ))
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами, постами, '
+        'комментариями и подписками со степенным распределением.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=30000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок на пользователя.'
+        )
+        parser.add_argument(
+            '--images', type=float, default=0.3,
+            help='Доля постов с картинкой.'
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней распределить даты публикаций.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def create(self, model, objects):
+        """bulk_create пачками, возвращает id новых записей по порядку.
+
+        SQLite не возвращает id из bulk_create, поэтому они выбираются
+        заново по диапазону.
+        """
+        last = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        for batch in batches(objects, self.batch_size):
+            model.objects.bulk_create(batch)
+        return list(
+            model.objects.filter(pk__gt=last).order_by('pk').values_list(
+                'pk', flat=True
+            )
+        )
+
+    def images(self):
+        directory = os.path.join(settings.MEDIA_ROOT, 'posts')
+        os.makedirs(directory, exist_ok=True)
+        names = []
+        for i in range(IMAGES):
+            name = f'posts/dataset_{i}.jpg'
+            path = os.path.join(settings.MEDIA_ROOT, name)
+            if not os.path.exists(path):
+                color = tuple(random.randrange(256) for _ in range(3))
+                Image.new('RGB', (1200, 800), color).save(path, 'JPEG')
+            names.append(name)
+        return names
+
+    def users(self, count):
+        start = User.objects.count()
+        password = make_password(None)
+        return self.create(User, (
+            User(
+                username=f'{self.fake.user_name()}_{start + i}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                password=password
+            )
+            for i in range(count)
+        ))
+
+    def groups(self, count):
+        start = Group.objects.count()
+        return self.create(Group, (
+            Group(
+                title=self.fake.sentence(nb_words=3)[:200],
+                slug=f'group-{start + i}',
+                description=self.fake.paragraph()
+            )
+            for i in range(count)
+        ))
+
+    def posts(self, count, authors, groups, images, share, days):
+        popular = zipf_weights(len(authors))
+        ids = self.create(Post, (
+            Post(
+                author_id=random.choices(authors, cum_weights=popular)[0],
+                group_id=random.choice(groups + [None]) if groups else None,
+                text=self.fake.paragraph(nb_sentences=random.randint(1, 8)),
+                image=random.choice(images) if random.random() < share else ''
+            )
+            for _ in range(count)
+        ))
+        # pub_date выставляется auto_now_add, поэтому даты, возрастающие
+        # вместе с id, проставляются отдельным проходом.
+        now = timezone.now()
+        step = timedelta(days=days) / max(len(ids), 1)
+        for batch in batches(enumerate(ids), self.batch_size):
+            Post.objects.bulk_update([
+                Post(pk=pk, pub_date=now - step * (len(ids) - i))
+                for i, pk in batch
+            ], ['pub_date'])
+        return ids
+
+    def comments(self, count, posts, users):
+        viral = zipf_weights(len(posts))
+        shuffled = random.sample(posts, len(posts))
+        return self.create(Comment, (
+            Comment(
+                post_id=random.choices(shuffled, cum_weights=viral)[0],
+                author_id=random.choice(users),
+                text=self.fake.sentence()
+            )
+            for _ in range(count)
+        ))
+
+    def follows(self, users, mean):
+        popular = zipf_weights(len(users))
+        authors = random.sample(users, len(users))
+
+        def graph():
+            for user in users:
+                # Распределение Парето с параметром 2 имеет среднее 2.
+                wanted = min(
+                    int(mean * random.paretovariate(2) / 2), len(users) - 1
+                )
+                chosen = set()
+                for _ in range(wanted * 3):
+                    if len(chosen) >= wanted:
+                        break
+                    author = random.choices(authors, cum_weights=popular)[0]
+                    if author != user:
+                        chosen.add(author)
+                for author in chosen:
+                    yield Follow(user_id=user, author_id=author)
+
+        return self.create(Follow, graph())
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        Faker.seed(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.batch_size = options['batch_size']
+
+        users = self.users(options['users'])
+        groups = self.groups(options['groups'])
+        posts = self.posts(
+            options['posts'], users, groups,
+            self.images() if options['images'] else [],
+            options['images'], options['days']
+        )
+        comments = self.comments(options['comments'], posts, users)
+        follows = self.follows(users, options['follows'])
+
+        # bulk_create не посылает сигналов: производные данные
+        # пересчитываются целиком.
+        call_command('repair_counters', verbosity=0, stdout=self.stdout)
+        call_command('rebuild_timelines', verbosity=0, stdout=self.stdout)
+        call_command(
+            'decay_trending', rebuild=True, verbosity=0, stdout=self.stdout
+        )
+        etags.touch()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: пользователей {len(users)}, групп {len(groups)}, '
+            f'постов {len(posts)}, комментариев {len(comments)}, '
+            f'подписок {len(follows)}'
+        ))
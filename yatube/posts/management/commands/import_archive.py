@@ -0,0 +1,290 @@
+import csv
+import json
+import os
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import etags
+from posts.models import (
+    Comment, Group, ImportCheckpoint, LegacyPost, Post, User
+)
+from posts.utils import batches
+
+POST = 'post'
+COMMENT = 'comment'
+
+
+@contextmanager
+def archive_dates():
+    """Отключает auto_now_add, чтобы у записей остались даты из архива.
+
+    Меняет поля моделей на уровне процесса, поэтому годится только
+    для команды, а не для веб-воркера.
+    """
+    fields = (
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    )
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def parse_date(value):
+    date = parse_datetime(value) if value else None
+    if date is None:
+        return timezone.now()
+    if timezone.is_naive(date):
+        return timezone.make_aware(date)
+    return date
+
+
+class Lookup:
+    """Таблица «имя -> id» в памяти; недостающие строки создаются
+    одним bulk_create на пачку.
+    """
+
+    def __init__(self, model, field, make):
+        self.model = model
+        self.field = field
+        self.make = make
+        self.ids = dict(model.objects.values_list(field, 'pk'))
+        self.created = 0
+
+    def resolve(self, names):
+        missing = {name for name in names if name and name not in self.ids}
+        if missing:
+            self.model.objects.bulk_create(
+                [self.make(name) for name in missing], ignore_conflicts=True
+            )
+            self.ids.update(self.model.objects.filter(
+                **{f'{self.field}__in': missing}
+            ).values_list(self.field, 'pk'))
+            self.created += len(missing)
+
+    def __getitem__(self, name):
+        return self.ids.get(name) if name else None
+
+
+def read_lines(stream, offset):
+    """Строки файла и смещение конца каждой из них."""
+    stream.seek(offset)
+    for raw in iter(stream.readline, b''):
+        offset += len(raw)
+        yield raw.decode('utf-8'), offset
+
+
+def read_ndjson(stream, offset):
+    for line, end in read_lines(stream, offset):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line), end
+        except ValueError as error:
+            raise CommandError(f'Байт {end - len(line)}: {error}')
+
+
+def read_csv(stream, offset):
+    stream.seek(0)
+    header = stream.readline()
+    fieldnames = next(csv.reader([header.decode('utf-8')]))
+    position = max(offset, len(header))
+    consumed = {'end': position}
+
+    def lines():
+        for line, end in read_lines(stream, position):
+            consumed['end'] = end
+            yield line
+
+    # csv не читает вперёд: после каждой записи смещение указывает
+    # на её последнюю строку, даже если поле было многострочным.
+    for row in csv.DictReader(lines(), fieldnames=fieldnames):
+        yield row, consumed['end']
+
+
+READERS = {
+    'ndjson': read_ndjson,
+    'csv': read_csv,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково импортирует посты и комментарии из NDJSON или CSV '
+        'пачками bulk_create и продолжает с места сбоя.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл архива.')
+        parser.add_argument(
+            '--format', choices=sorted(READERS), default=None,
+            help='Формат файла, по умолчанию - по расширению.'
+        )
+        parser.add_argument(
+            '--kind', choices=(POST, COMMENT), default=None,
+            help='Тип записей, если в них нет поля type.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Сколько записей сохранять в одной транзакции.'
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать файл с начала, забыв сохранённую точку.'
+        )
+        parser.add_argument(
+            '--no-rebuild', action='store_true',
+            help='Не пересчитывать счётчики и ленты в конце.'
+        )
+
+    def kind(self, record):
+        kind = record.get('type') or self.default_kind
+        if kind not in (POST, COMMENT):
+            raise CommandError(f'Неизвестный тип записи: {record!r}')
+        return kind
+
+    def import_posts(self, records):
+        self.authors.resolve(record['author'] for record in records)
+        self.groups.resolve(record.get('group') for record in records)
+        known = set(LegacyPost.objects.filter(
+            legacy_id__in=[str(record['id']) for record in records]
+        ).values_list('legacy_id', flat=True))
+        unique = {}
+        for record in records:
+            # Повтор id в архиве или уже импортированный пост пропускаются.
+            legacy_id = str(record['id'])
+            if legacy_id not in known:
+                unique.setdefault(legacy_id, record)
+        records = list(unique.values())
+        if not records:
+            return 0
+        last = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+        posts = Post.objects.bulk_create([
+            Post(
+                author_id=self.authors[record['author']],
+                group_id=self.groups[record.get('group')],
+                text=record['text'],
+                image=record.get('image') or '',
+                pub_date=parse_date(record.get('pub_date'))
+            )
+            for record in records
+        ])
+        if posts[0].pk is None:
+            # SQLite не возвращает id из bulk_create. Блокировку записи
+            # транзакция пачки взяла до чтения Max(pk) (см. handle), так
+            # что новые id идут подряд; проверка ловит нарушение этого.
+            ids = list(Post.objects.filter(pk__gt=last).order_by(
+                'pk'
+            ).values_list('pk', flat=True))
+            if len(ids) != len(records):
+                raise CommandError(
+                    f'Среди новых постов чужие: id {len(ids)}, '
+                    f'записей {len(records)}'
+                )
+        else:
+            ids = [post.pk for post in posts]
+        LegacyPost.objects.bulk_create([
+            LegacyPost(legacy_id=str(record['id']), post_id=post_id)
+            for record, post_id in zip(records, ids)
+        ])
+        return len(records)
+
+    def import_comments(self, records):
+        self.authors.resolve(record['author'] for record in records)
+        posts = dict(LegacyPost.objects.filter(
+            legacy_id__in=[str(record['post']) for record in records]
+        ).values_list('legacy_id', 'post_id'))
+        comments = [
+            Comment(
+                post_id=posts[str(record['post'])],
+                author_id=self.authors[record['author']],
+                text=record['text'],
+                created=parse_date(record.get('created'))
+            )
+            for record in records if str(record['post']) in posts
+        ]
+        Comment.objects.bulk_create(comments)
+        self.skipped += len(records) - len(comments)
+        return len(comments)
+
+    def import_batch(self, records):
+        # Посты пачки сохраняются раньше комментариев к ним.
+        posts = [record for record in records if self.kind(record) == POST]
+        comments = [
+            record for record in records if self.kind(record) == COMMENT
+        ]
+        try:
+            if posts:
+                self.posts += self.import_posts(posts)
+            if comments:
+                self.comments += self.import_comments(comments)
+        except KeyError as error:
+            raise CommandError(f'В записи пачки нет поля {error}')
+
+    def handle(self, *args, **options):
+        path = os.path.realpath(options['path'])
+        file_format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'ndjson'
+        )
+        self.default_kind = options['kind']
+        self.posts = self.comments = self.skipped = 0
+        self.authors = Lookup(User, 'username', lambda username: User(
+            username=username, password=make_password(None)
+        ))
+        self.groups = Lookup(Group, 'slug', lambda slug: Group(
+            title=slug, slug=slug, description=''
+        ))
+
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(source=path)
+        if options['restart']:
+            checkpoint.offset = checkpoint.records = 0
+            checkpoint.save()
+        if checkpoint.offset:
+            self.stdout.write(
+                f'Продолжение с байта {checkpoint.offset}, '
+                f'уже импортировано записей: {checkpoint.records}'
+            )
+
+        with open(path, 'rb') as stream, archive_dates():
+            records = READERS[file_format](stream, checkpoint.offset)
+            for batch in batches(records, options['batch_size']):
+                with transaction.atomic():
+                    # Первая запись берёт блокировку записи SQLite
+                    # (BEGIN в atomic() отложенный): до коммита пачки
+                    # никто не вставит посты между её чтениями и записями.
+                    checkpoint.offset = batch[-1][1]
+                    checkpoint.records += len(batch)
+                    checkpoint.save(update_fields=('offset', 'records'))
+                    self.import_batch([record for record, _ in batch])
+                if options['verbosity'] > 1:
+                    self.stdout.write(
+                        f'Записей: {checkpoint.records}, '
+                        f'байт: {checkpoint.offset}'
+                    )
+
+        if (self.posts or self.comments) and not options['no_rebuild']:
+            # bulk_create не посылает сигналов: производные данные
+            # пересчитываются целиком.
+            call_command('repair_counters', verbosity=0, stdout=self.stdout)
+            call_command('rebuild_timelines', verbosity=0, stdout=self.stdout)
+            call_command(
+                'decay_trending', rebuild=True, verbosity=0, stdout=self.stdout
+            )
+        etags.touch()
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано: постов {self.posts}, комментариев '
+            f'{self.comments}; без поста пропущено {self.skipped}; '
+            f'создано авторов {self.authors.created}, '
+            f'групп {self.groups.created}'
+        ))
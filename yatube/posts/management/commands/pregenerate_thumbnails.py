@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate, ready_variants_many, variants
+from posts.utils import batches
+
+
+class Command(BaseCommand):
+    help = 'Строит недостающие варианты уже загруженных картинок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Для скольких постов искать готовые варианты разом.'
+        )
+
+    def handle(self, *args, **options):
+        expected = len(variants())
+        posts = Post.objects.exclude(image='').only('pk', 'image').order_by(
+            'pk'
+        )
+        built = 0
+        size = options['batch_size']
+        for batch in batches(posts.iterator(chunk_size=size), size):
+            ready = ready_variants_many([post.image for post in batch])
+            for post in batch:
+                found = ready[post.image.name]
+                if sum(map(len, found.values())) == expected:
+                    continue
+                generate(post.pk, post.image.name)
+                built += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Варианты картинок построены для постов: {built}'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Timeline
+from posts.timeline import rebuild_timelines
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок с нуля.'
+
+    def handle(self, *args, **options):
+        rebuild_timelines()
+        self.stdout.write(self.style.SUCCESS(
+            f'Лент пересобрано, записей: {Timeline.objects.count()}'
+        ))
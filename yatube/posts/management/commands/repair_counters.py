@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from posts import etags
+from posts.counters import repair_authors, repair_groups, repair_posts
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает денормализованные счётчики постов, авторов и групп.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько авторов пересчитывать за один проход.'
+        )
+
+    def handle(self, *args, **options):
+        posts = repair_posts()
+        authors = repair_authors(options['batch_size'])
+        groups = repair_groups()
+        if groups:
+            etags.touch()
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счётчиков: постов {posts}, авторов {authors}, '
+            f'групп {groups}'
+        ))
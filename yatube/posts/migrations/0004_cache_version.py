@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='cache_version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Версия кэша'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='cache_version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Версия кэша'),
+        ),
+    ]
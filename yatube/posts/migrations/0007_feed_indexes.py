@@ -0,0 +1,63 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:01
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def drop_duplicate_follows(apps, schema_editor):
+    """Оставляет по одной подписке на пару до уникального ограничения
+    и пересчитывает счётчики затронутых авторов и подписчиков."""
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    Follow = apps.get_model('posts', 'Follow')
+    duplicates = Follow.objects.values('user', 'author').annotate(
+        first=Min('pk'), total=Count('pk')
+    ).filter(total__gt=1)
+    users, authors = set(), set()
+    for pair in duplicates.iterator():
+        Follow.objects.filter(
+            user=pair['user'], author=pair['author']
+        ).exclude(pk=pair['first']).delete()
+        users.add(pair['user'])
+        authors.add(pair['author'])
+    for field, counter, user_ids in (
+        ('user', 'following_count', users),
+        ('author', 'followers_count', authors),
+    ):
+        counts = dict(Follow.objects.filter(
+            **{f'{field}__in': user_ids}
+        ).order_by().values(field).annotate(
+            total=Count('pk')
+        ).values_list(field, 'total'))
+        for user_id in user_ids:
+            AuthorStats.objects.filter(user_id=user_id).update(
+                **{counter: counts.get(user_id, 0)}
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_import_archive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created'], name='comment_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'pub_date'], name='post_author_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', 'pub_date'], name='post_group_pub_date_idx'),
+        ),
+        migrations.RunPython(
+            drop_duplicate_follows, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='follow_unique_user_author'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:20
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def fill_group_aggregates(apps, schema_editor):
+    """Заполняет счётчики групп одним UPDATE с подзапросами."""
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.filter(group=OuterRef('pk')).order_by()
+    Group.objects.update(
+        posts_count=Coalesce(Subquery(
+            posts.values('group').annotate(total=Count('pk')).values('total')
+        ), 0),
+        latest_post=Subquery(
+            posts.order_by('-pub_date', '-pk').values('pk')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_trending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='latest_post',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='posts.Post', verbose_name='Последний пост'),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число постов'),
+        ),
+        migrations.AddIndex(
+            model_name='group',
+            index=models.Index(fields=['title'], name='group_title_idx'),
+        ),
+        migrations.RunPython(
+            fill_group_aggregates, migrations.RunPython.noop
+        ),
+    ]
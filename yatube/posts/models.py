@@ -4,7 +4,32 @@ from django.contrib.auth import get_user_model
 User = get_user_model()
 
 
-class Group(models.Model):
+class DerivedFieldsMixin:
+    """Модель с полями, которые меняются только UPDATE с F().
+
+    Обычное сохранение существующей строки не пишет поля
+    ``derived_fields``: иначе объект, загруженный до приращения, вернул
+    бы старое значение.
+    """
+    derived_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            not self._state.adding and not args
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+        ):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred
+                and field.name not in self.derived_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class Group(DerivedFieldsMixin, models.Model):
     title = models.CharField(
         verbose_name='Название группы',
         max_length=200
@@ -16,22 +41,47 @@ class Group(models.Model):
     description = models.TextField(
         verbose_name='Описание'
     )
+    cache_version = models.PositiveIntegerField(
+        verbose_name='Версия кэша',
+        default=1,
+        editable=False
+    )
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Число постов',
+        default=0,
+        editable=False
+    )
+    latest_post = models.ForeignKey(
+        'Post',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='+',
+        editable=False,
+        verbose_name='Последний пост'
+    )
+
+    derived_fields = ('cache_version', 'posts_count', 'latest_post')
 
     class Meta:
         verbose_name = 'Группа'
         verbose_name_plural = 'Группы'
+        indexes = (
+            models.Index(fields=('title',), name='group_title_idx'),
+        )
 
     def __str__(self):
         return self.title
 
 
-class Post(models.Model):
+class Post(DerivedFieldsMixin, models.Model):
     text = models.TextField(
         verbose_name='Текст поста',
         help_text='Текст нового поста'
     )
     pub_date = models.DateTimeField(
         auto_now_add=True,
+        db_index=True,
         verbose_name='Дата публикации',
         help_text='Дата публикации поста'
     )
@@ -56,11 +106,33 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        verbose_name='Число комментариев',
+        default=0,
+        editable=False
+    )
+    cache_version = models.PositiveIntegerField(
+        verbose_name='Версия кэша',
+        default=1,
+        editable=False
+    )
+
+    derived_fields = ('comments_count', 'cache_version')
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = (
+            models.Index(
+                fields=('author', 'pub_date'),
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=('group', 'pub_date'),
+                name='post_group_pub_date_idx'
+            ),
+        )
 
     def __str__(self):
         return self.text[:15]
@@ -85,12 +157,19 @@ class Comment(models.Model):
     )
     created = models.DateTimeField(
         verbose_name='Дата комментария',
-        auto_now_add=True
+        auto_now_add=True,
+        db_index=True
     )
 
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = (
+            models.Index(
+                fields=('post', 'created'),
+                name='comment_post_created_idx'
+            ),
+        )
 
 
 class Follow(models.Model):
@@ -110,3 +189,189 @@ class Follow(models.Model):
     class Meta:
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='follow_unique_user_author'
+            ),
+        )
+
+
+class AuthorStats(models.Model):
+    """Счётчики автора, поддерживаемые при записи."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Число постов',
+        default=0
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Число подписчиков',
+        default=0
+    )
+    following_count = models.PositiveIntegerField(
+        verbose_name='Число подписок',
+        default=0
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики автора'
+        verbose_name_plural = 'Счётчики авторов'
+
+
+class Timeline(models.Model):
+    """Материализованная лента подписок: пост в ленте подписчика."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timelines',
+        verbose_name='Пост'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор поста'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации поста'
+    )
+
+    class Meta:
+        ordering = ('-pub_date', '-post_id')
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-post'),
+                name='timeline_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=('user', 'author'),
+                name='timeline_user_author_idx'
+            ),
+        )
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='timeline_unique_user_post'
+            ),
+        )
+
+
+class Suggestion(models.Model):
+    """Рекомендация «на кого подписаться», посчитанная заранее."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggestions',
+        verbose_name='Пользователь'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Рекомендованный автор'
+    )
+    rank = models.PositiveSmallIntegerField(
+        verbose_name='Место в списке'
+    )
+    shared_follows = models.PositiveIntegerField(
+        verbose_name='Подписок пользователя, подписанных на автора',
+        default=0
+    )
+    shared_groups = models.PositiveIntegerField(
+        verbose_name='Общих групп',
+        default=0
+    )
+
+    class Meta:
+        ordering = ('user', 'rank')
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'rank'),
+                name='suggestion_unique_user_rank'
+            ),
+        )
+
+
+class TrendingScore(models.Model):
+    """Счёт поста в ленте «Популярное».
+
+    Хранится двоичный логарифм суммы 2^(t / TRENDING_HALF_LIFE) по
+    временам t комментариев. Так счета всех постов сравнимы между собой
+    без пересчёта: затухание со временем одинаково сдвигает их все.
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending',
+        verbose_name='Пост'
+    )
+    score = models.FloatField(
+        verbose_name='Счёт',
+        db_index=True
+    )
+
+    class Meta:
+        ordering = ('-score', '-post_id')
+        verbose_name = 'Счёт популярности'
+        verbose_name_plural = 'Счета популярности'
+
+
+class LegacyPost(models.Model):
+    """Соответствие id поста на старой платформе посту в Yatube."""
+    legacy_id = models.CharField(
+        verbose_name='Id на старой платформе',
+        max_length=64,
+        primary_key=True
+    )
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Пост'
+    )
+
+    class Meta:
+        verbose_name = 'Импортированный пост'
+        verbose_name_plural = 'Импортированные посты'
+
+
+class ImportCheckpoint(models.Model):
+    """Докуда импортирован файл архива.
+
+    Обновляется в одной транзакции с очередной пачкой записей, поэтому
+    после сбоя импорт продолжается ровно с первой незаписанной.
+    """
+    source = models.CharField(
+        verbose_name='Файл',
+        max_length=255,
+        unique=True
+    )
+    offset = models.BigIntegerField(
+        verbose_name='Смещение в байтах',
+        default=0
+    )
+    records = models.BigIntegerField(
+        verbose_name='Импортировано записей',
+        default=0
+    )
+
+    class Meta:
+        verbose_name = 'Точка импорта'
+        verbose_name_plural = 'Точки импорта'
@@ -0,0 +1,123 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .utils import CursorPage, decode_score_cursor, score_page
+
+FTS_TABLE = 'posts_post_fts'
+
+# Внешнее содержимое: индекс хранит только токены, текст берётся из
+# posts_post. Триггеры держат индекс в согласии с таблицей при любой
+# записи, включая bulk_create и update().
+FTS_SCHEMA = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"text, content='posts_post', content_rowid='id', "
+    f"tokenize='unicode61')",
+)
+FTS_TRIGGERS = (
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai "
+    f"AFTER INSERT ON posts_post BEGIN "
+    f"INSERT INTO {FTS_TABLE} (rowid, text) VALUES (new.id, new.text); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad "
+    f"AFTER DELETE ON posts_post BEGIN "
+    f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, text) "
+    f"VALUES ('delete', old.id, old.text); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au "
+    f"AFTER UPDATE OF text ON posts_post BEGIN "
+    f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, text) "
+    f"VALUES ('delete', old.id, old.text); "
+    f"INSERT INTO {FTS_TABLE} (rowid, text) VALUES (new.id, new.text); END",
+)
+
+WORD = re.compile(r'\w+')
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def install(**kwargs):
+    """Создаёт FTS-индекс и триггеры, если их нет.
+
+    Вызывается после каждого migrate: SQLite пересоздаёт posts_post при
+    изменении её схемы, и триггеры при этом теряются.
+    """
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+            [FTS_TABLE]
+        )
+        created = cursor.fetchone() is None
+        for statement in FTS_SCHEMA + FTS_TRIGGERS:
+            cursor.execute(statement)
+    if created:
+        rebuild()
+
+
+def rebuild():
+    """Переиндексирует все посты и сжимает индекс."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')"
+        )
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')"
+        )
+
+
+def match_expression(query):
+    """Превращает ввод пользователя в безопасный запрос FTS5.
+
+    Каждое слово ищется как префикс, все слова должны встретиться.
+    """
+    return ' '.join(f'"{word}"*' for word in WORD.findall(query.lower()))
+
+
+def filter_posts(queryset, query):
+    """Оставляет в выборке посты, подходящие под запрос (без ранжирования)."""
+    expression = match_expression(query)
+    if not expression:
+        return queryset.none()
+    if not fts_available():
+        return queryset.filter(text__icontains=query)
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [expression]
+    ))
+
+
+def _ranked_ids(expression, after, limit):
+    sql = (
+        f'SELECT rowid, rank FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s'
+    )
+    params = [expression]
+    if after:
+        sql += ' AND (rank > %s OR (rank = %s AND rowid > %s))'
+        params += [after[0], after[0], after[1]]
+    sql += ' ORDER BY rank, rowid LIMIT %s'
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [limit])
+        return cursor.fetchall()
+
+
+def search_page(posts, query, cursor, per_page):
+    """Страница результатов поиска, отсортированных по релевантности (bm25).
+
+    Листается курсором (rank, id); ``posts`` - выборка, из которой
+    достаются найденные посты.
+    """
+    expression = match_expression(query)
+    if not expression:
+        return CursorPage([], None, None, None)
+    if not fts_available():
+        found = list(filter_posts(posts, query)[:per_page])
+        return CursorPage(found, None, None, None)
+
+    rows = _ranked_ids(
+        expression, decode_score_cursor(cursor or ''), per_page + 1
+    )
+    return score_page(posts, rows, per_page)
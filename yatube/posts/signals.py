@@ -0,0 +1,117 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.db import transaction
+from django.dispatch import receiver
+
+from . import (
+    cards, counters, etags, events, follows, timeline, trending
+)
+from .models import Comment, Follow, Group, Post
+
+
+def page_scopes(post):
+    return etags.post_scopes(
+        post.pk, post.author_id, post.author.username,
+        post.group.slug if post.group_id else None
+    )
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, **kwargs):
+    # Пост мог сменить группу: старая лента тоже сбрасывается, а
+    # счётчики старой группы пересчитываются.
+    instance.previous_scopes = []
+    instance.previous_group_id = None
+    if instance.pk:
+        previous = Post.objects.filter(pk=instance.pk).values_list(
+            'author__username', 'group__slug', 'group_id'
+        ).first()
+        if previous:
+            instance.previous_scopes = etags.feed_scopes(*previous[:2])
+            instance.previous_group_id = previous[2]
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_author(instance.author_id, posts_count=1)
+        timeline.fan_out(instance)
+        transaction.on_commit(lambda: events.append(instance))
+        if instance.group_id:
+            counters.bump_group(instance.group_id, 1, instance.pk)
+    else:
+        cards.bump_post(instance.pk)
+        if instance.previous_group_id != instance.group_id:
+            for group_id, delta in (
+                (instance.previous_group_id, -1), (instance.group_id, 1)
+            ):
+                if group_id:
+                    counters.bump_group(group_id, delta)
+    scopes = set(page_scopes(instance) + instance.previous_scopes)
+    if instance.group_id or instance.previous_group_id:
+        scopes.add(etags.GROUPS)
+    etags.touch(*scopes)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    if not created:
+        cards.bump_group(instance.pk)
+        # Название группы есть на карточках во всех лентах.
+        etags.touch()
+    else:
+        etags.touch(etags.GROUPS)
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    etags.touch()
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.bump_author(instance.author_id, posts_count=-1)
+    etags.touch(*page_scopes(instance))
+    if instance.group_id:
+        counters.bump_group(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_comments(instance.post_id, 1)
+        trending.bump(instance.post_id, instance.created)
+        etags.touch(*page_scopes(instance.post))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.bump_comments(instance.post_id, -1)
+    etags.touch(*etags.stored_post_scopes(instance.post_id))
+
+
+def follow_scopes(follow):
+    # Счётчики и кнопка подписки в обоих профилях, лента подписчика.
+    return (
+        etags.author_scope(follow.user.username),
+        etags.author_scope(follow.author.username),
+        etags.follow_scope(follow.user_id),
+    )
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_author(instance.user_id, following_count=1)
+        counters.bump_author(instance.author_id, followers_count=1)
+        timeline.add_author(instance)
+        follows.invalidate(instance.user_id)
+        etags.touch(*follow_scopes(instance))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.bump_author(instance.user_id, following_count=-1)
+    counters.bump_author(instance.author_id, followers_count=-1)
+    timeline.remove_author(instance)
+    follows.invalidate(instance.user_id)
+    etags.touch(*follow_scopes(instance))
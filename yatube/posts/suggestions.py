@@ -0,0 +1,87 @@
+import heapq
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Follow, Post, Suggestion, User
+from .utils import batches
+
+
+def load_graph():
+    """Весь граф подписок и группы авторов, прочитанные по разу.
+
+    Группы автора - те, в которых он публиковался.
+    """
+    following = defaultdict(set)
+    follows = Follow.objects.values_list('user_id', 'author_id').order_by()
+    for user_id, author_id in follows.iterator(chunk_size=10000):
+        following[user_id].add(author_id)
+    groups = defaultdict(set)
+    members = defaultdict(set)
+    posted = Post.objects.filter(group__isnull=False).values_list(
+        'author_id', 'group_id'
+    ).order_by().distinct()
+    for author_id, group_id in posted.iterator(chunk_size=10000):
+        groups[author_id].add(group_id)
+        members[group_id].add(author_id)
+    return following, groups, members
+
+
+def rank(user_id, following, groups, members, top):
+    """Лучшие ``top`` авторов для пользователя.
+
+    Авторы упорядочены по числу подписок пользователя, которые на них
+    подписаны, затем по числу общих групп. Себя и тех, на кого
+    пользователь уже подписан, в списке нет. Счёт ведут Counter.update
+    по множествам, без цикла по парам на Python.
+    """
+    followed = following.get(user_id, set())
+    shared_follows = Counter()
+    for author_id in followed:
+        shared_follows.update(following.get(author_id, ()))
+    shared_groups = Counter()
+    for group_id in groups.get(user_id, ()):
+        shared_groups.update(members[group_id])
+    candidates = (shared_follows.keys() | shared_groups.keys()) - followed
+    candidates.discard(user_id)
+    best = heapq.nlargest(top, candidates, key=lambda author_id: (
+        shared_follows[author_id], shared_groups[author_id], -author_id
+    ))
+    return [
+        (author_id, shared_follows[author_id], shared_groups[author_id])
+        for author_id in best
+    ]
+
+
+def compute_suggestions(top=None, batch_size=1000):
+    """Пересчитывает рекомендации всех пользователей.
+
+    Рекомендации пачки пользователей заменяются в одной транзакции,
+    поэтому читатель не застаёт пустой список. Возвращает число записей.
+    """
+    top = top or settings.SUGGESTIONS_TOP
+    following, groups, members = load_graph()
+    users = User.objects.values_list('pk', flat=True).order_by('pk')
+    written = 0
+    for batch in batches(users.iterator(chunk_size=batch_size), batch_size):
+        suggestions = [
+            Suggestion(
+                user_id=user_id,
+                author_id=author_id,
+                rank=position,
+                shared_follows=shared_follows,
+                shared_groups=shared_groups
+            )
+            for user_id in batch
+            for position, (author_id, shared_follows, shared_groups)
+            in enumerate(rank(user_id, following, groups, members, top), 1)
+        ]
+        with transaction.atomic():
+            # id идут по возрастанию: диапазон вместо длинного IN.
+            Suggestion.objects.filter(
+                user_id__gte=batch[0], user_id__lte=batch[-1]
+            ).delete()
+            Suggestion.objects.bulk_create(suggestions, batch_size=500)
+        written += len(suggestions)
+    return written
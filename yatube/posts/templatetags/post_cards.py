@@ -0,0 +1,29 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from ..cards import render_cards
+from ..utils import NEXT, encode_cursor
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(page_obj, author_posts=False, groups=False):
+    """Возвращает список отрендеренных карточек постов страницы."""
+    return [
+        mark_safe(card)
+        for card in render_cards(list(page_obj), author_posts, groups)
+    ]
+
+
+@register.simple_tag
+def next_cursor(page_obj):
+    """Курсор порции ленты после этой страницы, для подгрузки прокруткой.
+
+    У страницы с номером курсора нет, он строится по её последнему посту.
+    """
+    if getattr(page_obj, 'cursor_mode', False):
+        return page_obj.next_cursor or ''
+    if page_obj.has_next():
+        return encode_cursor(page_obj[len(page_obj) - 1], NEXT)
+    return ''
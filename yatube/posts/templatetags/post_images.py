@@ -0,0 +1,43 @@
+from django import template
+from django.conf import settings
+
+from ..thumbnails import ready_variants
+
+register = template.Library()
+
+MIME_TYPES = {
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+}
+
+
+def _srcset(thumbnails):
+    return ', '.join(
+        f'{thumbnail.url} {width}w' for width, thumbnail in thumbnails
+    )
+
+
+@register.inclusion_tag('includes/post_picture.html')
+def post_picture(image, css_class='', alt='', variants=None):
+    """Картинка поста с srcset по всем готовым вариантам.
+
+    ``variants`` - заранее найденные варианты, иначе они ищутся здесь.
+    Пока нет ни одного JPEG-варианта, показывается заглушка.
+    """
+    if isinstance(variants, dict):
+        ready = dict(variants)
+    else:
+        ready = ready_variants(image) if image else {}
+    fallback = ready.pop('JPEG', None)
+    return {
+        'image': image,
+        'fallback': fallback[-1][1] if fallback else None,
+        'srcset': _srcset(fallback) if fallback else '',
+        'sources': [
+            {'type': MIME_TYPES[image_format], 'srcset': _srcset(thumbnails)}
+            for image_format, thumbnails in ready.items()
+        ],
+        'sizes': settings.POST_IMAGE_SIZES_ATTR,
+        'css_class': css_class,
+        'alt': alt,
+    }
@@ -1,10 +1,13 @@
 import shutil
 import tempfile
+from io import StringIO
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import features
 
 from ..models import User, Group, Post, Comment
 
@@ -62,6 +65,51 @@ class PostFormTests(TestCase):
             content_type='image/gif'
         )
 
+    def test_thumbnails_pregenerated_on_upload(self):
+        """Миниатюры строятся при загрузке, до того - заглушка."""
+        create = reverse('posts:post_create')
+        self.authorized_client.post(
+            create, data={'text': 'Отложенная', 'image': self.uploaded}
+        )
+        post = Post.objects.get(text='Отложенная')
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        self.assertContains(response, 'изображение обрабатывается')
+
+        with self.settings(THUMBNAIL_WORKERS=0):
+            self.authorized_client.post(
+                create, data={'text': 'Сразу', 'image': self.uploaded_new}
+            )
+        post = Post.objects.get(text='Сразу')
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        self.assertNotContains(response, 'изображение обрабатывается')
+        self.assertContains(response, f'{settings.MEDIA_URL}cache/')
+        for width, _ in settings.POST_IMAGE_SIZES:
+            self.assertContains(response, f' {width}w')
+        if features.check('webp'):
+            self.assertContains(response, 'image/webp')
+
+    def test_pregenerate_thumbnails_command(self):
+        """Команда достраивает варианты картинок, загруженных без них."""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Без вариантов', 'image': self.uploaded}
+        )
+        post = Post.objects.get(text='Без вариантов')
+        out = StringIO()
+        call_command('pregenerate_thumbnails', stdout=out)
+        self.assertIn('постов: 1', out.getvalue())
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        self.assertNotContains(response, 'изображение обрабатывается')
+        out = StringIO()
+        call_command('pregenerate_thumbnails', stdout=out)
+        self.assertIn('постов: 0', out.getvalue())
+
     def test_create_post(self):
         """При отправке формы со страницы создания поста
         создаётся новая запись в базе данных.
@@ -1,6 +1,25 @@
-from django.test import TestCase
+import csv
+import json
+import math
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-from ..models import Group, Post, User
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .. import trending
+from ..models import (
+    AuthorStats, Comment, Follow, Group, LegacyPost, Post, Suggestion,
+    Timeline, TrendingScore, User
+)
 
 
 class PostModelTest(TestCase):
@@ -57,3 +76,385 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     post._meta.get_field(field).help_text, expected_value)
+
+
+class CountersTest(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+
+    def stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_counters_follow_writes(self):
+        """Счётчики обновляются при создании и удалении записей."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий'
+        )
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_stale_save_keeps_counter(self):
+        """Сохранение устаревшего объекта не затирает счётчик."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        stale = Post.objects.get(pk=post.pk)
+        Comment.objects.create(post=post, author=self.reader, text='Текст')
+        stale.text = 'Правка'
+        stale.save()
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Правка')
+        self.assertEqual(post.comments_count, 1)
+
+    def test_repair_counters(self):
+        """Команда repair_counters исправляет разошедшиеся счётчики."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.create(post=post, author=self.reader, text='Текст')
+        Post.objects.bulk_create(
+            [Post(author=self.author, text='Без сигналов')]
+        )
+        Post.objects.filter(pk=post.pk).update(comments_count=5)
+
+        call_command('repair_counters', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 2)
+        self.assertFalse(AuthorStats.objects.filter(user=self.reader).exists())
+
+
+class GroupCountersTest(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.groups = [
+            Group.objects.create(title=f'Группа {i}', slug=f'counted-{i}')
+            for i in range(2)
+        ]
+
+    def aggregates(self, group):
+        group.refresh_from_db()
+        return group.posts_count, group.latest_post_id
+
+    def test_counters_follow_post_writes(self):
+        """Число постов и последний пост группы следуют за записью,
+        переносом и удалением постов."""
+        first, second = self.groups
+        old = Post.objects.create(author=self.author, group=first, text='1')
+        new = Post.objects.create(author=self.author, group=first, text='2')
+        self.assertEqual(self.aggregates(first), (2, new.pk))
+
+        new.group = second
+        new.save()
+        self.assertEqual(self.aggregates(first), (1, old.pk))
+        self.assertEqual(self.aggregates(second), (1, new.pk))
+
+        new.delete()
+        old.delete()
+        self.assertEqual(self.aggregates(first), (0, None))
+        self.assertEqual(self.aggregates(second), (0, None))
+
+    def test_stale_save_keeps_aggregates(self):
+        """Переименование устаревшего объекта группы не затирает
+        число постов и последний пост."""
+        group = self.groups[0]
+        stale = Group.objects.get(pk=group.pk)
+        post = Post.objects.create(author=self.author, group=group, text='1')
+        stale.title = 'Переименованная'
+        stale.save()
+        self.assertEqual(self.aggregates(group), (1, post.pk))
+
+    def test_repair_counters_fixes_groups(self):
+        group = self.groups[0]
+        post = Post.objects.create(author=self.author, group=group, text='1')
+        Group.objects.filter(pk=group.pk).update(
+            posts_count=7, latest_post=None
+        )
+        out = StringIO()
+        call_command('repair_counters', stdout=out)
+        self.assertIn('групп 1', out.getvalue())
+        self.assertEqual(self.aggregates(group), (1, post.pk))
+
+
+class FollowConstraintTest(TestCase):
+
+    def test_duplicate_follow_rejected(self):
+        """Повторная подписка на того же автора не сохраняется."""
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=author)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=reader, author=author)
+        self.assertEqual(Follow.objects.count(), 1)
+
+
+class SuggestionsTest(TestCase):
+
+    def setUp(self):
+        self.users = {
+            name: User.objects.create_user(username=name)
+            for name in ('reader', 'a', 'b', 'c', 'd', 'e')
+        }
+        for user, author in (
+            ('reader', 'a'), ('reader', 'b'),
+            ('a', 'c'), ('b', 'c'), ('b', 'd'), ('a', 'reader'),
+        ):
+            Follow.objects.create(
+                user=self.users[user], author=self.users[author]
+            )
+        group = Group.objects.create(title='Группа', slug='suggest')
+        for name in ('reader', 'e'):
+            Post.objects.create(
+                author=self.users[name], group=group, text='Пост'
+            )
+
+    def suggested(self, name):
+        return [
+            (suggestion.author.username, suggestion.shared_follows,
+             suggestion.shared_groups)
+            for suggestion in Suggestion.objects.filter(
+                user=self.users[name]
+            )
+        ]
+
+    def test_ranks_by_shared_follows_then_groups(self):
+        """Сначала авторы, на которых подписаны подписки, затем - общие
+        группы; себя и уже отслеживаемых в списке нет."""
+        call_command('compute_suggestions', stdout=StringIO())
+        self.assertEqual(self.suggested('reader'), [
+            ('c', 2, 0), ('d', 1, 0), ('e', 0, 1)
+        ])
+        self.assertEqual(self.suggested('e'), [('reader', 0, 1)])
+
+    def test_recompute_replaces_rows(self):
+        call_command('compute_suggestions', stdout=StringIO())
+        Follow.objects.create(
+            user=self.users['reader'], author=self.users['c']
+        )
+        call_command('compute_suggestions', '--top=1', stdout=StringIO())
+        self.assertEqual(self.suggested('reader'), [('d', 1, 0)])
+
+
+class TrendingTest(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='trend_author')
+        self.posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(3)
+        ]
+
+    def comment(self, post, count, age=0):
+        comments = [
+            Comment.objects.create(
+                post=post, author=self.author, text='Комментарий'
+            )
+            for _ in range(count)
+        ]
+        Comment.objects.filter(pk__in=[c.pk for c in comments]).update(
+            created=F('created') - timedelta(seconds=age)
+        )
+
+    def scores(self):
+        return dict(TrendingScore.objects.values_list('post_id', 'score'))
+
+    def test_bump_matches_rebuild(self):
+        """Счёт от сигналов совпадает с пересчётом по комментариям."""
+        self.comment(self.posts[0], 3)
+        self.comment(self.posts[1], 1)
+        bumped = self.scores()
+        trending.rebuild()
+        rebuilt = self.scores()
+        self.assertEqual(bumped.keys(), rebuilt.keys())
+        for post_id, score in bumped.items():
+            self.assertAlmostEqual(score, rebuilt[post_id], places=6)
+        self.assertAlmostEqual(
+            bumped[self.posts[0].pk] - bumped[self.posts[1].pk],
+            math.log2(3), places=2
+        )
+
+    def test_recent_activity_outranks_old(self):
+        """Комментарий теряет половину веса за TRENDING_HALF_LIFE."""
+        self.comment(self.posts[0], 3, age=settings.TRENDING_HALF_LIFE)
+        self.comment(self.posts[1], 2)
+        self.comment(self.posts[2], 1)
+        trending.rebuild()
+        self.assertEqual(
+            list(TrendingScore.objects.values_list('post_id', flat=True)),
+            [self.posts[1].pk, self.posts[0].pk, self.posts[2].pk]
+        )
+
+    def test_decay_command_prunes_and_rebuilds(self):
+        self.comment(self.posts[0], 1)
+        trending.bump(self.posts[1].pk, timezone.now() - timedelta(
+            seconds=settings.TRENDING_HALF_LIFE * 10
+        ))
+        out = StringIO()
+        call_command('decay_trending', stdout=out)
+        self.assertIn('удалено: 1', out.getvalue())
+        self.assertEqual(list(self.scores()), [self.posts[0].pk])
+        TrendingScore.objects.all().delete()
+        call_command('decay_trending', '--rebuild', stdout=StringIO())
+        self.assertEqual(list(self.scores()), [self.posts[0].pk])
+        later = timezone.now() + timedelta(
+            seconds=settings.TRENDING_HALF_LIFE * 10
+        )
+        self.assertEqual(trending.prune(later), 1)
+
+
+class GenerateDatasetTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_generates_consistent_dataset(self):
+        """generate_dataset создаёт данные и согласованные счётчики."""
+        with override_settings(MEDIA_ROOT=self.media_root):
+            call_command(
+                'generate_dataset', users=30, groups=3, posts=200,
+                comments=300, follows=5, seed=1, stdout=StringIO()
+            )
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Comment.objects.count(), 300)
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+        dates = list(Post.objects.order_by('pk').values_list(
+            'pub_date', flat=True
+        ))
+        self.assertEqual(dates, sorted(dates))
+        self.assertGreater(dates[-1] - dates[0], timedelta(days=300))
+
+        top = User.objects.annotate(
+            total=Count('posts')
+        ).order_by('-total').first()
+        self.assertEqual(top.stats.posts_count, top.posts.count())
+        self.assertEqual(
+            Timeline.objects.count(),
+            Post.objects.filter(author__following__isnull=False).count()
+        )
+
+
+class ImportArchiveTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'archive.ndjson')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write(self, records, mode='w'):
+        with open(self.path, mode, encoding='utf-8') as archive:
+            for record in records:
+                archive.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def run_import(self, path=None, **options):
+        call_command(
+            'import_archive', path or self.path, stdout=StringIO(), **options
+        )
+
+    def post(self, legacy_id, **fields):
+        return {
+            'type': 'post',
+            'id': legacy_id,
+            'author': 'old_author',
+            'text': f'Пост {legacy_id}',
+            'pub_date': '2015-06-01T12:00:00+00:00',
+            **fields,
+        }
+
+    def test_import_posts_and_comments(self):
+        """Посты и комментарии импортируются с датами, авторами и
+        группами из архива."""
+        self.write([
+            self.post(1, group='archive'),
+            self.post(2),
+            {'type': 'comment', 'post': 1, 'author': 'reader', 'text': 'Ок',
+             'created': '2015-06-02T10:00:00'},
+            {'type': 'comment', 'post': 99, 'author': 'reader', 'text': '?'},
+        ])
+        self.run_import(batch_size=2)
+
+        legacy = LegacyPost.objects.get(legacy_id='1')
+        post = Post.objects.get(pk=legacy.post_id)
+        self.assertEqual(post.pub_date.year, 2015)
+        self.assertEqual(post.group.slug, 'archive')
+        self.assertEqual(post.author.username, 'old_author')
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.comments.get().created.day, 2)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(post.author.stats.posts_count, 2)
+
+    def test_resume_after_failure(self):
+        """После сбоя импорт продолжается без повторов."""
+        self.write([self.post(1), self.post(2), self.post(3)])
+        with open(self.path, 'a', encoding='utf-8') as archive:
+            archive.write('{"broken\n')
+        with self.assertRaises(CommandError):
+            self.run_import(batch_size=2)
+        self.assertEqual(Post.objects.count(), 2)
+
+        with open(self.path, 'rb+') as archive:
+            content = archive.read()
+            archive.seek(content.rindex(b'{"broken'))
+            archive.write(json.dumps(self.post(4)).encode() + b'\n')
+        self.run_import(batch_size=2)
+        self.run_import(batch_size=2)
+        self.assertEqual(
+            set(LegacyPost.objects.values_list('legacy_id', flat=True)),
+            {'1', '2', '3', '4'}
+        )
+        self.assertEqual(Post.objects.count(), 4)
+
+    def test_foreign_posts_abort_batch(self):
+        """Чужой пост среди новых id прерывает пачку, а не путает связи."""
+        writer = User.objects.create_user(username='writer')
+        bulk_create = Post.objects.bulk_create
+
+        def racing(posts):
+            created = bulk_create(posts)
+            bulk_create([
+                Post(author=writer, text='Чужой', pub_date=timezone.now())
+            ])
+            return created
+
+        self.write([self.post(1), self.post(2)])
+        with mock.patch.object(Post.objects, 'bulk_create', racing):
+            with self.assertRaises(CommandError):
+                self.run_import()
+        self.assertFalse(LegacyPost.objects.exists())
+        self.assertFalse(Post.objects.exists())
+
+    def test_import_csv(self):
+        """CSV читается потоково, многострочные поля не ломают смещения."""
+        path = os.path.join(self.directory, 'posts.csv')
+        with open(path, 'w', encoding='utf-8', newline='') as archive:
+            writer = csv.writer(archive)
+            writer.writerow(('id', 'author', 'group', 'text', 'pub_date'))
+            writer.writerow((1, 'old_author', '', 'Строка\nвторая', ''))
+            writer.writerow((2, 'old_author', 'csv', 'Ещё', '2016-01-01'))
+        self.run_import(path, kind='post', batch_size=1)
+        self.assertEqual(
+            set(Post.objects.values_list('text', flat=True)),
+            {'Строка\nвторая', 'Ещё'}
+        )
+        self.assertTrue(Group.objects.filter(slug='csv').exists())
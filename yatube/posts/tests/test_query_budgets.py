@@ -0,0 +1,301 @@
+import os
+import shutil
+import sys
+import tempfile
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import URLPattern, reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from about import urls as about_urls
+from api import urls as api_urls
+from posts import urls as posts_urls
+from users import urls as users_urls
+from ..models import Comment, Follow, Group, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+# Потолок числа запросов для каждой именованной страницы при пустом
+# кэше. Новая страница без записи здесь роняет test_every_url_has_budget.
+BUDGETS = {
+    'posts:index': 4,
+    'posts:index_cards': 3,
+    'posts:group_cards': 4,
+    'posts:profile_cards': 4,
+    'posts:follow_cards': 6,
+    'posts:index_events': 0,
+    'posts:group_events': 1,
+    'posts:follow_events': 3,
+    'posts:index_rss': 1,
+    'posts:index_atom': 1,
+    'posts:trending': 4,
+    'posts:group_rss': 2,
+    'posts:group_atom': 2,
+    'posts:profile_rss': 2,
+    'posts:profile_atom': 2,
+    'posts:groups': 2,
+    'posts:group_list': 5,
+    'posts:profile': 9,
+    'posts:post_detail': 4,
+    'posts:post_edit': 5,
+    'posts:post_create': 3,
+    'posts:add_comment': 7,
+    'posts:follow_index': 8,
+    'posts:search': 4,
+    'posts:export': 4,
+    'posts:profile_unfollow': 8,
+    'posts:profile_follow': 11,
+    'users:signup': 0,
+    'users:login': 0,
+    'users:logout': 4,
+    'users:password_change': 2,
+    'users:password_change_done': 2,
+    'users:password_reset': 0,
+    'users:password_reset_done': 0,
+    'users:password_reset_confirm': 5,
+    'users:password_reset_complete': 0,
+    'about:author': 0,
+    'about:tech': 0,
+    'api:index': 1,
+    'api:post_detail': 3,
+    'api:group_list': 2,
+    'api:profile': 2,
+    'api:follow_index': 5,
+}
+
+PROJECT_ROOT = os.path.abspath(settings.BASE_DIR)
+TESTS_ROOT = os.path.dirname(os.path.abspath(__file__))
+MANAGE_PY = os.path.join(PROJECT_ROOT, 'manage.py')
+DJANGO_DB = os.path.join('django', 'db', '')
+
+
+def _location(filename, frame):
+    return f'{filename}:{frame.f_lineno} in {frame.f_code.co_name}'
+
+
+def call_site(frame):
+    """Место в шаблоне или в коде проекта, откуда пришёл запрос."""
+    python_site = fallback = None
+    while frame is not None:
+        if frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                name = os.path.relpath(origin.name, PROJECT_ROOT)
+                return f'{name}:{token.lineno}'
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(PROJECT_ROOT):
+            if python_site is None and not (
+                filename.startswith(TESTS_ROOT) or filename == MANAGE_PY
+            ):
+                python_site = _location(
+                    os.path.relpath(filename, PROJECT_ROOT), frame
+                )
+        elif fallback is None and DJANGO_DB not in filename:
+            # Запрос из самого Django: сессии, авторизация.
+            fallback = _location(
+                filename[filename.rfind('django' + os.sep):], frame
+            )
+        frame = frame.f_back
+    return python_site or fallback or '<django>'
+
+
+class QueryRecorder:
+    """execute_wrapper, запоминающий SQL вместе с местом вызова."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((call_site(sys._getframe(1)), sql))
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def report(self):
+        grouped = defaultdict(list)
+        for site, sql in self.queries:
+            grouped[site].append(sql)
+        return '\n'.join(
+            f'  {site} ({len(queries)}):\n'
+            + '\n'.join(f'    {sql}' for sql in queries)
+            for site, queries in grouped.items()
+        )
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0, SSE_STREAM_SECONDS=0
+)
+class QueryBudgetTest(TestCase):
+    """Число запросов страниц не растёт вместе с их содержимым."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='budget_author', email='author@example.com'
+        )
+        cls.reader = User.objects.create_user(username='budget_reader')
+        # Ни разу не входивший пользователь: вход меняет last_login,
+        # и токен сброса пароля перестаёт действовать.
+        cls.forgetful = User.objects.create_user(username='budget_forgetful')
+        cls.group = Group.objects.create(title='Группа', slug='budget')
+        cls.image = default_storage.save(
+            'posts/budget.gif', ContentFile(SMALL_GIF)
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост бюджета',
+            image=cls.image
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        # Без комментария «Популярное» пусто и не читает постов.
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий'
+        )
+
+    def fill(self, posts, comments):
+        """Добавляет постов и комментариев, чтобы заполнить страницы."""
+        for i in range(posts):
+            post = Post.objects.create(
+                author=self.author,
+                group=self.group,
+                text=f'Пост бюджета {i}',
+                image=default_storage.save(
+                    f'posts/budget_{i}.gif', ContentFile(SMALL_GIF)
+                )
+            )
+            for j in range(comments):
+                Comment.objects.create(
+                    post=post,
+                    author=User.objects.get_or_create(
+                        username=f'commenter_{j}'
+                    )[0],
+                    text='Комментарий'
+                )
+
+    def pages(self):
+        """(имя, адрес, пользователь, метод) для каждой страницы."""
+        uid = urlsafe_base64_encode(force_bytes(self.forgetful.pk))
+        token = default_token_generator.make_token(self.forgetful)
+        post_id = {'post_id': self.post.pk}
+        username = {'username': self.author.username}
+        slug = {'slug': self.group.slug}
+        return (
+            ('posts:index', {}, None, 'get'),
+            ('posts:index_cards', {}, None, 'get'),
+            ('posts:group_cards', slug, None, 'get'),
+            ('posts:profile_cards', username, None, 'get'),
+            ('posts:follow_cards', {}, self.reader, 'get'),
+            ('posts:index_events', {}, None, 'get'),
+            ('posts:group_events', slug, None, 'get'),
+            ('posts:follow_events', {}, self.reader, 'get'),
+            ('posts:index_rss', {}, None, 'get'),
+            ('posts:index_atom', {}, None, 'get'),
+            ('posts:trending', {}, None, 'get'),
+            ('posts:group_rss', slug, None, 'get'),
+            ('posts:group_atom', slug, None, 'get'),
+            ('posts:profile_rss', username, None, 'get'),
+            ('posts:profile_atom', username, None, 'get'),
+            ('posts:groups', {}, None, 'get'),
+            ('posts:group_list', {'slug': self.group.slug}, None, 'get'),
+            ('posts:profile', username, self.reader, 'get'),
+            ('posts:post_detail', post_id, None, 'get'),
+            ('posts:post_edit', post_id, self.author, 'get'),
+            ('posts:post_create', {}, self.author, 'get'),
+            ('posts:add_comment', post_id, self.reader, 'post'),
+            ('posts:follow_index', {}, self.reader, 'get'),
+            ('posts:search', {}, None, 'get'),
+            ('posts:export', {}, self.author, 'get'),
+            ('posts:profile_unfollow', username, self.reader, 'get'),
+            ('posts:profile_follow', username, self.reader, 'get'),
+            ('users:signup', {}, None, 'get'),
+            ('users:login', {}, None, 'get'),
+            ('users:logout', {}, self.reader, 'get'),
+            ('users:password_change', {}, self.reader, 'get'),
+            ('users:password_change_done', {}, self.reader, 'get'),
+            ('users:password_reset', {}, None, 'get'),
+            ('users:password_reset_done', {}, None, 'get'),
+            ('users:password_reset_confirm',
+             {'uidb64': uid, 'token': token}, None, 'get'),
+            ('users:password_reset_complete', {}, None, 'get'),
+            ('about:author', {}, None, 'get'),
+            ('about:tech', {}, None, 'get'),
+            ('api:index', {}, None, 'get'),
+            ('api:post_detail', post_id, None, 'get'),
+            ('api:group_list', slug, None, 'get'),
+            ('api:profile', username, None, 'get'),
+            ('api:follow_index', {}, self.reader, 'get'),
+        )
+
+    def measure(self):
+        counts = {}
+        for name, kwargs, user, method in self.pages():
+            self.client.logout()
+            if user is not None:
+                self.client.force_login(user)
+            url = reverse(name, kwargs=kwargs)
+            data = {'q': 'бюджета'} if name == 'posts:search' else {}
+            if method == 'post':
+                data = {'text': 'Комментарий'}
+            cache.clear()
+            recorder = QueryRecorder()
+            with connection.execute_wrapper(recorder):
+                response = getattr(self.client, method)(url, data)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            counts[name] = recorder
+        return counts
+
+    def test_every_url_has_budget(self):
+        """Для каждой именованной страницы задан бюджет запросов."""
+        names = {
+            f'{module.app_name}:{pattern.name}'
+            for module in (posts_urls, users_urls, about_urls, api_urls)
+            for pattern in module.urlpatterns
+            if isinstance(pattern, URLPattern) and pattern.name
+        }
+        self.assertEqual(names, set(BUDGETS))
+        self.assertEqual(names, {page[0] for page in self.pages()})
+
+    def test_queries_within_budget_and_constant(self):
+        """Запросов не больше бюджета и не больше, чем на почти пустых
+        страницах."""
+        small = self.measure()
+        self.fill(posts=settings.POSTS_ON_PAGE * 2, comments=3)
+        large = self.measure()
+        for name, budget in BUDGETS.items():
+            with self.subTest(page=name):
+                for recorder in (small[name], large[name]):
+                    self.assertLessEqual(
+                        len(recorder), budget,
+                        f'{name}: запросов больше бюджета\n'
+                        f'{recorder.report()}'
+                    )
+                self.assertLessEqual(
+                    len(large[name]), len(small[name]),
+                    f'{name}: число запросов растёт с содержимым\n'
+                    f'{large[name].report()}'
+                )
@@ -66,6 +66,11 @@ class PostURLTests(TestCase):
         response_404 = self.guest_client.get('/unexisting_page/')
         self.assertEqual(response_404.status_code, HTTPStatus.NOT_FOUND)
 
+    def test_unknown_profile_not_found(self):
+        """Профиль несуществующего пользователя отвечает 404."""
+        response = self.guest_client.get('/profile/unknown_user/')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
     def test_url_authorized_redirect_anonymous(self):
         """Страницы для авторизованных пользователей перенаправляют
         анонимного пользователя на страницу логина.
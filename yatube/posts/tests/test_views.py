@@ -1,14 +1,28 @@
+import json
 import shutil
 import tempfile
+import time
+from http import HTTPStatus
+from io import StringIO
 
 from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import User, Group, Post, Comment, Follow
+from .. import events, follows
+from ..etags import GROUPS, changed
+from ..models import (
+    User, Group, Post, Comment, Follow, Suggestion, Timeline, TrendingScore
+)
+from ..utils import encode_cursor, encode_score_cursor
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -257,6 +271,8 @@ class PaginatorViewsTest(TestCase):
                 group=self.group) for i in range(13)
         ]
         self.posts = Post.objects.bulk_create(posts)
+        # bulk_create не шлёт сигналы, ленты подписок пересобираются явно.
+        call_command('rebuild_timelines', stdout=StringIO())
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
         self.view_names = (
@@ -287,6 +303,92 @@ class PaginatorViewsTest(TestCase):
                     )
 
 
+@override_settings(POSTS_NUMBERED_PAGES=1)
+class CursorPaginatorViewsTest(PaginatorViewsTest):
+
+    def test_paginator_ten_records_per_page(self):
+        """Большая выборка листается курсором вперёд и назад."""
+        for current_page in self.view_names:
+            with self.subTest(current_page=current_page):
+                first = self.authorized_client.get(current_page)
+                page_obj = first.context['page_obj']
+                self.assertTrue(page_obj.cursor_mode)
+                self.assertEqual(len(page_obj), 10)
+                self.assertFalse(page_obj.has_previous())
+
+                second = self.authorized_client.get(
+                    current_page, {'cursor': page_obj.next_cursor}
+                )
+                next_page = second.context['page_obj']
+                self.assertEqual(len(next_page), 3)
+                self.assertFalse(next_page.has_next())
+                self.assertEqual(
+                    {post.text for post in [*page_obj, *next_page]},
+                    {post.text for post in self.posts}
+                )
+
+                back = self.authorized_client.get(
+                    current_page, {'cursor': next_page.previous_cursor}
+                )
+                self.assertEqual(
+                    list(back.context['page_obj']), list(page_obj)
+                )
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Испорченный курсор возвращает первую страницу."""
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'cursor': 'broken'}
+        )
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+
+@override_settings(COMMENTS_PREVIEW=2)
+class CommentPreviewTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='commentator')
+
+    def add_post(self, comments):
+        post = Post.objects.create(author=self.user, text='Пост')
+        for i in range(comments):
+            author = User.objects.create_user(username=f'c{post.pk}_{i}')
+            Comment.objects.create(post=post, author=author, text=f'К{i}')
+        return post
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('posts:index'))
+        return len(context), response
+
+    def test_previews_in_constant_queries(self):
+        """Превью комментариев грузятся без запросов на каждый пост."""
+        self.add_post(comments=3)
+        queries_one, _ = self.count_queries()
+        self.add_post(comments=3)
+        self.add_post(comments=1)
+        cache.clear()
+        queries_many, response = self.count_queries()
+        self.assertEqual(queries_one, queries_many)
+
+        previews = [
+            [comment.text for comment in post.comment_previews]
+            for post in response.context['page_obj']
+        ]
+        self.assertEqual(previews, [['К0'], ['К1', 'К2'], ['К1', 'К2']])
+
+    def test_cached_cards_skip_previews(self):
+        """Для карточек из кэша комментарии не читаются."""
+        self.add_post(comments=3)
+        self.client.get(reverse('posts:index'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('posts:index'))
+        self.assertFalse(any(
+            'FROM "posts_comment"' in query['sql'] for query in queries
+        ))
+
+
 class CacheTest(TestCase):
 
     def setUp(self):
@@ -300,24 +402,575 @@ class CacheTest(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def test_cache_posts(self):
-        """При удалении записи, она остается в кэше страницы
-        до принудительной очистки кэша.
-        """
+        """Карточка поста берётся из кэша, пока не сменилась её версия."""
         response = self.authorized_client.get(reverse('posts:index'))
 
-        self.post.text = 'Проверка кэширования поста'
-        self.post.save()
+        Post.objects.filter(pk=self.post.pk).update(text='Мимо версии')
         response_cache = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(response_cache.content, response.content)
 
-        Post.objects.get(id=self.post.pk).delete()
-        response_del = self.authorized_client.get(reverse('posts:index'))
-        self.assertEqual(response_del.content, response.content)
-
         cache.clear()
         response_clear = self.authorized_client.get(reverse('posts:index'))
         self.assertNotEqual(response_clear.content, response.content)
 
+    def test_edit_invalidates_card(self):
+        """Правка поста, комментарий и смена группы видны сразу."""
+        group = Group.objects.create(title='Группа', slug='cache-group')
+        self.post.group = group
+        self.post.save()
+        self.assertContains(
+            self.authorized_client.get(reverse('posts:index')), 'Группа'
+        )
+
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Проверка кэширования поста', 'group': group.pk}
+        )
+        self.assertContains(
+            self.authorized_client.get(reverse('posts:index')),
+            'Проверка кэширования поста'
+        )
+
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Свежий комментарий'}
+        )
+        self.assertContains(
+            self.authorized_client.get(reverse('posts:index')),
+            'Свежий комментарий'
+        )
+
+        group.title = 'Переименованная'
+        group.save()
+        self.assertContains(
+            self.authorized_client.get(reverse('posts:index')),
+            'Переименованная'
+        )
+
+        Post.objects.get(pk=self.post.pk).delete()
+        self.assertNotContains(
+            self.authorized_client.get(reverse('posts:index')),
+            'Проверка кэширования поста'
+        )
+
+    def test_stale_save_invalidates_card(self):
+        """Правка объекта, загруженного до комментария, видна на ленте."""
+        cache.clear()
+        stale = Post.objects.get(pk=self.post.pk)
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий'
+        )
+        self.authorized_client.get(reverse('posts:index'))
+        stale.text = 'Правка устаревшего объекта'
+        stale.save()
+        self.assertContains(
+            self.authorized_client.get(reverse('posts:index')),
+            'Правка устаревшего объекта'
+        )
+
+
+class ConditionalGetTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='etag_user')
+        self.reader = User.objects.create_user(username='etag_reader')
+        Follow.objects.create(user=self.reader, author=self.user)
+        self.group = Group.objects.create(title='Группа', slug='etag')
+        self.other = Group.objects.create(title='Другая', slug='etag-other')
+        self.post = Post.objects.create(
+            author=self.user, group=self.group, text='Пост'
+        )
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+        self.pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'etag'}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:follow_index'),
+        )
+
+    def test_not_modified_until_content_changes(self):
+        """Неизменившаяся страница отвечает 304, после записи - 200."""
+        for page in self.pages:
+            with self.subTest(page=page):
+                response = self.authorized_client.get(page)
+                etag = response['ETag']
+                self.assertEqual(
+                    self.authorized_client.get(
+                        page, HTTP_IF_NONE_MATCH=etag
+                    ).status_code,
+                    HTTPStatus.NOT_MODIFIED
+                )
+                Comment.objects.create(
+                    post=self.post, author=self.user, text='Новый'
+                )
+                self.assertEqual(
+                    self.authorized_client.get(
+                        page, HTTP_IF_NONE_MATCH=etag
+                    ).status_code,
+                    HTTPStatus.OK
+                )
+
+    def test_unrelated_writes_keep_etag(self):
+        """Запись в чужой группе и чужие подписки не сбрасывают ETag."""
+        pages = self.pages[1:]
+        etags = [self.authorized_client.get(page)['ETag'] for page in pages]
+        stranger = User.objects.create_user(username='etag_stranger')
+        post = Post.objects.create(
+            author=stranger, group=self.other, text='Чужой'
+        )
+        Comment.objects.create(post=post, author=stranger, text='Чужой')
+        Follow.objects.create(user=stranger, author=self.reader)
+        for page, etag in zip(pages, etags):
+            with self.subTest(page=page):
+                self.assertEqual(
+                    self.authorized_client.get(
+                        page, HTTP_IF_NONE_MATCH=etag
+                    ).status_code,
+                    HTTPStatus.NOT_MODIFIED
+                )
+
+    def test_new_session_gets_fresh_form(self):
+        """После повторного входа страница с формой не отдаётся 304:
+        CSRF-токен в ней от прошлой сессии."""
+        self.authorized_client.logout()
+        self.authorized_client.force_login(self.user)
+        page = self.pages[3]
+        etag = self.authorized_client.get(page)['ETag']
+        self.authorized_client.logout()
+        self.authorized_client.force_login(self.user)
+        self.assertEqual(
+            self.authorized_client.get(
+                page, HTTP_IF_NONE_MATCH=etag
+            ).status_code,
+            HTTPStatus.OK
+        )
+
+    def test_etag_depends_on_viewer_and_cursor(self):
+        """ETag различается для разных зрителей и страниц ленты."""
+        index = reverse('posts:index')
+        etags = {
+            self.guest_client.get(index)['ETag'],
+            self.authorized_client.get(index)['ETag'],
+            self.authorized_client.get(index, {'page': 2})['ETag'],
+        }
+        self.assertEqual(len(etags), 3)
+
+
+class SearchTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='search_user')
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Пост номер {i} про котов')
+            for i in range(settings.POSTS_ON_PAGE + 3)
+        )
+        cls.relevant = Post.objects.create(
+            author=cls.user, text='Коты, коты и ещё раз котики'
+        )
+        Post.objects.create(author=cls.user, text='Пост про собак')
+
+    def search(self, query, **params):
+        return self.client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+
+    def test_ranked_and_paged_by_cursor(self):
+        """Результаты упорядочены по релевантности и листаются курсором."""
+        response = self.search('кот')
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj[0], self.relevant)
+        self.assertEqual(len(page_obj), settings.POSTS_ON_PAGE)
+        self.assertTrue(page_obj.has_next())
+        response = self.search('кот', cursor=page_obj.next_cursor)
+        rest = response.context['page_obj']
+        self.assertEqual(len(rest), 4)
+        self.assertFalse(rest.has_next())
+        self.assertFalse(set(page_obj) & set(rest))
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при правке и удалении постов."""
+        self.assertEqual(len(self.search('собак').context['page_obj']), 1)
+        Post.objects.filter(text='Пост про собак').update(text='Про птиц')
+        self.assertEqual(len(self.search('собак').context['page_obj']), 0)
+        self.assertEqual(len(self.search('птиц').context['page_obj']), 1)
+        Post.objects.filter(text='Про птиц').delete()
+        self.assertEqual(len(self.search('птиц').context['page_obj']), 0)
+
+    def test_query_syntax_is_escaped(self):
+        """Служебные символы FTS в запросе не приводят к ошибке."""
+        for query in ('"', 'кот OR', 'NEAR(', '*', ''):
+            with self.subTest(query=query):
+                self.assertEqual(
+                    self.search(query).status_code, HTTPStatus.OK
+                )
+
+
+class CardsFragmentTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='scroll_author')
+        cls.reader = User.objects.create_user(username='scroll_reader')
+        cls.group = Group.objects.create(title='Группа', slug='scroll')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Запись №{i}.'
+            )
+            for i in range(settings.POSTS_ON_PAGE + 3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def test_feeds_load_next_batches(self):
+        """Прокрутка ленты подгружает только карточки с курсором."""
+        feeds = (
+            ('posts:index', 'posts:index_cards', {}),
+            ('posts:group_list', 'posts:group_cards', {'slug': 'scroll'}),
+            ('posts:profile', 'posts:profile_cards',
+             {'username': 'scroll_author'}),
+            ('posts:follow_index', 'posts:follow_cards', {}),
+        )
+        for page, fragment, kwargs in feeds:
+            with self.subTest(page=page):
+                response = self.client.get(reverse(page, kwargs=kwargs))
+                url = reverse(fragment, kwargs=kwargs)
+                self.assertContains(response, f'data-url="{url}"')
+                cursor = response.content.decode().split(
+                    'data-cursor="'
+                )[1].split('"')[0]
+
+                response = self.client.get(url, {'cursor': cursor})
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                data = response.json()
+                self.assertIsNone(data['next_cursor'])
+                self.assertNotIn('<header', data['html'])
+                self.assertEqual(data['html'].count('<br>'), 3)
+                for post in self.posts[:3]:
+                    self.assertIn(post.text, data['html'])
+                self.assertNotIn(self.posts[3].text, data['html'])
+
+    def test_first_batch_and_bad_cursor(self):
+        url = reverse('posts:index_cards')
+        data = self.client.get(url).json()
+        self.assertIn(self.posts[-1].text, data['html'])
+        self.assertIsNotNone(data['next_cursor'])
+        response = self.client.get(url, {'cursor': 'broken'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_short_feed_has_no_loader(self):
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': 'scroll_reader'})
+        )
+        self.assertNotContains(response, 'feed-more')
+
+
+@override_settings(SSE_STREAM_SECONDS=0)
+class EventsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='events_author')
+        cls.stranger = User.objects.create_user(username='events_stranger')
+        cls.reader = User.objects.create_user(username='events_reader')
+        cls.cats = Group.objects.create(title='Коты', slug='events-cats')
+        cls.dogs = Group.objects.create(title='Псы', slug='events-dogs')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def publish(self, author, group):
+        # В TestCase on_commit не срабатывает: запись в журнал вручную.
+        events.append(Post.objects.create(author=author, group=group))
+
+    def stream(self, name, **kwargs):
+        response = self.client.get(
+            reverse(name, kwargs=kwargs), HTTP_LAST_EVENT_ID='0'
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return b''.join(response.streaming_content).decode()
+
+    def test_counts_new_posts_of_feed(self):
+        """В поток попадает число новых постов только своей ленты."""
+        self.publish(self.author, self.cats)
+        self.publish(self.stranger, self.cats)
+        self.publish(self.stranger, self.dogs)
+        cases = (
+            ('posts:index_events', {}, 3),
+            ('posts:group_events', {'slug': 'events-cats'}, 2),
+            ('posts:follow_events', {}, 1),
+        )
+        for name, kwargs, count in cases:
+            with self.subTest(name=name):
+                body = self.stream(name, **kwargs)
+                self.assertIn('event: new-posts', body)
+                self.assertIn('id: 3\n', body)
+                self.assertIn(f'data: {{"count": {count}}}', body)
+
+    def test_resumes_after_last_event_id(self):
+        self.publish(self.author, None)
+        response = self.client.get(
+            reverse('posts:index_events'), HTTP_LAST_EVENT_ID='1'
+        )
+        body = b''.join(response.streaming_content).decode()
+        self.assertNotIn('new-posts', body)
+        self.assertIn('retry:', body)
+
+    def test_resumes_from_query_parameter(self):
+        """Вкладка, вновь открывшая поток, передаёт место параметром."""
+        self.publish(self.author, None)
+        self.publish(self.author, None)
+        response = self.client.get(
+            reverse('posts:index_events'), {'last_event_id': '1'}
+        )
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn('data: {"count": 1}', body)
+
+    @override_settings(SSE_MAX_CONNECTIONS=1)
+    def test_connection_cap(self):
+        """Потоков не больше SSE_MAX_CONNECTIONS, место освобождает close."""
+        url = reverse('posts:index_events')
+        first = self.client.get(url)
+        refused = self.client.get(url)
+        self.assertEqual(refused.status_code, HTTPStatus.SERVICE_UNAVAILABLE)
+        self.assertIn('Retry-After', refused)
+        first.close()
+        second = self.client.get(url)
+        self.assertEqual(second.status_code, HTTPStatus.OK)
+        b''.join(second.streaming_content)
+
+    @override_settings(SSE_MAX_CONNECTIONS=1)
+    def test_connection_cap_is_shared_by_processes(self):
+        """Предел общий: места в кэше, а не в памяти процесса."""
+        worker, other_worker = events.Slots(), events.Slots()
+        lease = worker.acquire()
+        self.assertIsNotNone(lease)
+        self.assertIsNone(other_worker.acquire())
+        lease.release()
+        other_worker.acquire().release()
+
+    @override_settings(
+        SSE_MAX_CONNECTIONS=1, SSE_STREAM_SECONDS=1, SSE_KEEPALIVE=0
+    )
+    def test_lost_stream_frees_slot(self):
+        """Место потока, не закрытого умершим воркером, истекает само."""
+        lost = events.SLOTS.acquire()
+        self.assertIsNone(events.SLOTS.acquire())
+        time.sleep(1.1)
+        lease = events.SLOTS.acquire()
+        self.assertIsNotNone(lease)
+        lost.release()
+        self.assertIsNone(events.SLOTS.acquire())
+        lease.release()
+
+
+class EventsLogTest(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_created_posts_are_logged_after_commit(self):
+        author = User.objects.create_user(username='log_author')
+        post = Post.objects.create(author=author, text='Новый')
+        self.assertEqual(events.read(0), (1, [(post.pk, author.pk, None)]))
+        post.save()
+        self.assertEqual(events.last_sequence(), 1)
+
+
+class FeedTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='feed_author')
+        self.group = Group.objects.create(title='Коты', slug='cats')
+        self.other_group = Group.objects.create(title='Псы', slug='dogs')
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост про котов'
+        )
+        Post.objects.create(
+            author=self.author, group=self.other_group, text='Пост про псов'
+        )
+        self.group_rss = reverse('posts:group_rss', kwargs={'slug': 'cats'})
+        self.dogs_rss = reverse('posts:group_rss', kwargs={'slug': 'dogs'})
+
+    def test_feeds_list_posts_of_scope(self):
+        """RSS и Atom есть у общей ленты, групп и авторов."""
+        cases = (
+            ('posts:index_rss', {}, 'rss', True),
+            ('posts:index_atom', {}, 'atom', True),
+            ('posts:group_rss', {'slug': 'cats'}, 'rss', False),
+            ('posts:group_atom', {'slug': 'cats'}, 'atom', False),
+            ('posts:profile_rss', {'username': 'feed_author'}, 'rss', True),
+            ('posts:profile_atom', {'username': 'feed_author'}, 'atom', True),
+        )
+        for name, kwargs, kind, dogs in cases:
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name, kwargs=kwargs))
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertIn(kind, response['Content-Type'])
+                content = response.content.decode()
+                self.assertIn('Пост про котов', content)
+                self.assertEqual('Пост про псов' in content, dogs)
+        response = self.client.get(
+            reverse('posts:group_rss', kwargs={'slug': 'nope'})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_cached_body_and_conditional_get(self):
+        """Повторный опрос отдаётся из кэша, а с ETag - ответом 304."""
+        response = self.client.get(self.group_rss)
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.group_rss)
+            not_modified = self.client.get(
+                self.group_rss, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(not_modified.status_code, HTTPStatus.NOT_MODIFIED)
+        since = self.client.get(
+            self.group_rss, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(since.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_post_writes_invalidate_only_their_scope(self):
+        """Запись поста сбрасывает его ленты и не трогает чужие."""
+        cats = self.client.get(self.group_rss)['ETag']
+        dogs = self.client.get(self.dogs_rss)['ETag']
+        self.post.text = 'Пост про котят'
+        self.post.save()
+        response = self.client.get(self.group_rss, HTTP_IF_NONE_MATCH=cats)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'Пост про котят')
+        response = self.client.get(self.dogs_rss, HTTP_IF_NONE_MATCH=dogs)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+        # Пост, ушедший в другую группу, пропадает из старой ленты.
+        cats = self.client.get(self.group_rss)['ETag']
+        self.post.group = self.other_group
+        self.post.save()
+        response = self.client.get(self.group_rss, HTTP_IF_NONE_MATCH=cats)
+        self.assertNotContains(response, 'Пост про котят')
+        self.assertContains(self.client.get(self.dogs_rss), 'Пост про котят')
+
+
+class ExportTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='exporter')
+        self.other = User.objects.create_user(username='other')
+        self.group = Group.objects.create(title='Группа', slug='export')
+        self.post = Post.objects.create(
+            author=self.user, group=self.group, text='Мой пост',
+            image='posts/export.gif'
+        )
+        Post.objects.create(author=self.other, text='Чужой пост')
+        Comment.objects.create(post=self.post, author=self.user, text='Ок')
+        self.client.force_login(self.user)
+
+    def test_streams_own_posts_and_comments(self):
+        """Экспорт отдаётся потоком NDJSON только с данными пользователя."""
+        with override_settings(EXPORT_CHUNK_SIZE=1):
+            response = self.client.get(reverse('posts:export'))
+            self.assertTrue(response.streaming)
+            records = [
+                json.loads(line)
+                for line in b''.join(response.streaming_content).splitlines()
+            ]
+        self.assertEqual([record['type'] for record in records], [
+            'post', 'comment'
+        ])
+        post, comment = records
+        self.assertEqual(post['text'], 'Мой пост')
+        self.assertEqual(post['group'], 'export')
+        self.assertEqual(
+            post['image_url'], 'http://testserver/media/posts/export.gif'
+        )
+        self.assertEqual(comment['post'], self.post.pk)
+
+    def test_guest_redirected(self):
+        """Гость отправляется на страницу входа."""
+        self.client.logout()
+        response = self.client.get(reverse('posts:export'))
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+
+class QueryPlanTest(TestCase):
+    """Запросы лент идут по индексам, без сортировки во временном дереве."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='plan_author')
+        cls.reader = User.objects.create_user(username='plan_reader')
+        cls.group = Group.objects.create(title='Группа', slug='plan')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(settings.POSTS_ON_PAGE + 1):
+            post = Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {i}'
+            )
+            Comment.objects.create(post=post, author=cls.reader, text='Ок')
+
+    def plans(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        with connection.cursor() as cursor:
+            for query in queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                yield query['sql'], [row[-1] for row in cursor.fetchall()]
+        return response
+
+    def assert_indexed(self, url, **params):
+        for sql, plan in self.plans(url, **params):
+            with self.subTest(url=url, sql=sql):
+                for step in plan:
+                    self.assertNotIn('TEMP B-TREE', step, plan)
+                    scan = step.upper()
+                    if scan.startswith('SCAN') and 'SUBQUERY' not in scan:
+                        self.assertIn('USING', step, plan)
+
+    def test_feeds_use_indexes(self):
+        self.client.force_login(self.reader)
+        cursor = Post.objects.order_by('-pub_date', '-pk')[1]
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            cache.clear()
+            self.assert_indexed(url)
+            cache.clear()
+            self.assert_indexed(url, cursor=encode_cursor(cursor, 'n'))
+        post = Post.objects.first()
+        self.assert_indexed(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+
+    def test_group_directory_uses_title_index(self):
+        cache.clear()
+        self.assert_indexed(reverse('posts:groups'))
+
+    def test_trending_uses_score_index(self):
+        second = TrendingScore.objects.all()[1]
+        cache.clear()
+        self.assert_indexed(reverse('posts:trending'))
+        cache.clear()
+        self.assert_indexed(
+            reverse('posts:trending'),
+            cursor=encode_score_cursor(second.score, second.post_id)
+        )
+
 
 class FollowTests(TestCase):
 
@@ -412,3 +1065,258 @@ class FollowTests(TestCase):
         )
         self.assertIn(new_post, response_user_fol.context['page_obj'])
         self.assertNotIn(new_post, response_user_unfol.context['page_obj'])
+
+    def test_timeline_follows_subscriptions(self):
+        """Лента подписок пополняется и очищается при (от)писке."""
+        old_post = Post.objects.create(author=self.author, text='Старый')
+        timeline = Timeline.objects.filter(user=self.user_fol)
+        self.authorized_client.get(
+            reverse('posts:profile_follow', kwargs={'username': self.author})
+        )
+        self.assertEqual(
+            list(timeline.values_list('post', flat=True)), [old_post.pk]
+        )
+
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(
+            list(timeline.values_list('post', flat=True)),
+            [new_post.pk, old_post.pk]
+        )
+
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': self.author})
+        )
+        self.assertFalse(timeline.exists())
+
+
+class FollowGraphTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='graph_reader')
+        cls.authors = [
+            User.objects.create_user(username=f'graph_author_{i}')
+            for i in range(3)
+        ]
+        Follow.objects.create(user=cls.reader, author=cls.authors[2])
+        Follow.objects.create(user=cls.reader, author=cls.authors[0])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def graph(self):
+        return list(follows.following(
+            User.objects.get(pk=self.reader.pk)
+        ))
+
+    def follow_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [
+            query['sql'] for query in queries
+            if 'FROM "posts_follow"' in query['sql']
+        ]
+
+    def test_profile_reads_cached_graph(self):
+        """Подписка на автора проверяется по графу в кэше, а не в БД."""
+        first, second, third = (
+            reverse('posts:profile', kwargs={'username': author.username})
+            for author in self.authors
+        )
+        response, queries = self.follow_queries(first)
+        self.assertTrue(response.context['following'])
+        self.assertEqual(len(queries), 1)
+        response, queries = self.follow_queries(second)
+        self.assertFalse(response.context['following'])
+        self.assertEqual(queries, [])
+        response, queries = self.follow_queries(third)
+        self.assertTrue(response.context['following'])
+        self.assertEqual(queries, [])
+
+    def test_follow_and_unfollow_reset_graph(self):
+        """Подписка и отписка сбрасывают граф, он перечитывается из БД."""
+        ids = sorted([self.authors[0].pk, self.authors[2].pk])
+        self.assertEqual(self.graph(), ids)
+        author = self.authors[1]
+        self.client.get(
+            reverse('posts:profile_follow', kwargs={'username': author})
+        )
+        self.assertIsNone(cache.get(follows.KEY.format(self.reader.pk)))
+        with self.assertNumQueries(2):
+            self.assertEqual(self.graph(), sorted(ids + [author.pk]))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.graph(), sorted(ids + [author.pk]))
+        self.client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': author})
+        )
+        with self.assertNumQueries(2):
+            self.assertEqual(self.graph(), ids)
+
+
+class SuggestionsSidebarTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='side_reader')
+        self.authors = [
+            User.objects.create_user(username=f'side_author_{i}')
+            for i in range(2)
+        ]
+        Suggestion.objects.bulk_create(
+            Suggestion(user=self.reader, author=author, rank=rank)
+            for rank, author in enumerate(self.authors, 1)
+        )
+        self.client.force_login(self.reader)
+
+    def test_sidebar_on_follow_index_and_profile(self):
+        """Рекомендации читаются одним запросом, подписки отсеиваются."""
+        Follow.objects.create(user=self.reader, author=self.authors[1])
+        urls = (
+            reverse('posts:follow_index'),
+            reverse('posts:profile', kwargs={'username': 'side_reader'}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertEqual(
+                    [s.author for s in response.context['suggestions']],
+                    [self.authors[0]]
+                )
+                self.assertContains(response, 'На кого подписаться')
+                self.assertEqual(len([
+                    query for query in queries
+                    if 'FROM "posts_suggestion"' in query['sql']
+                ]), 1)
+
+
+class TrendingViewTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='trend_author')
+        self.posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(settings.POSTS_ON_PAGE + 2)
+        ]
+
+    def test_ranked_by_activity_with_cursor(self):
+        """Обсуждаемые посты идут первыми, страницы листаются курсором."""
+        for count, post in enumerate(self.posts[1:], 1):
+            for _ in range(count):
+                Comment.objects.create(
+                    post=post, author=self.author, text='Комментарий'
+                )
+        response = self.client.get(reverse('posts:trending'))
+        page_obj = response.context['page_obj']
+        expected = list(reversed(self.posts[1:]))
+        self.assertEqual(
+            list(page_obj), expected[:settings.POSTS_ON_PAGE]
+        )
+        response = self.client.get(
+            reverse('posts:trending'), {'cursor': page_obj.next_cursor}
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual(list(page_obj), expected[settings.POSTS_ON_PAGE:])
+        self.assertFalse(page_obj.has_next())
+
+    def test_without_comments_page_is_empty(self):
+        response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(list(response.context['page_obj']), [])
+        self.assertContains(response, 'Сейчас ничего не обсуждают.')
+
+
+class GroupDirectoryTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='directory_author')
+        cls.groups = [
+            Group.objects.create(title=f'Группа {i}', slug=f'directory-{i}')
+            for i in range(settings.GROUPS_ON_PAGE + 1)
+        ]
+        for text in ('Старый пост', 'Свежий пост'):
+            Post.objects.create(
+                author=cls.author, group=cls.groups[0], text=text
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_directory_lists_groups_with_aggregates(self):
+        response = self.client.get(reverse('posts:groups'))
+        self.assertContains(response, 'Группа 0')
+        self.assertContains(response, 'постов: 2')
+        self.assertContains(response, 'Свежий пост')
+        self.assertNotContains(response, 'Старый пост')
+        self.assertContains(response, 'В группе пока нет постов.')
+        self.assertContains(response, '1 из 2')
+        response = self.client.get(reverse('posts:groups'), {'page': 2})
+        self.assertContains(response, 'Группа 9')
+
+    def test_page_cached_until_post_written(self):
+        """Готовая страница каталога отдаётся без запросов к группам,
+        пока в группе не появится пост."""
+        url = reverse('posts:groups')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse(any(
+            'FROM "posts_group"' in query['sql'] for query in queries
+        ))
+        version = changed([GROUPS])
+        Post.objects.create(
+            author=self.author, group=self.groups[1], text='Новый пост'
+        )
+        self.assertNotEqual(changed([GROUPS]), version)
+        response = self.client.get(url)
+        self.assertContains(response, 'Новый пост')
+
+
+class AdminChangelistTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.groups = [
+            Group.objects.create(title=f'Группа {i}', slug=f'admin-{i}')
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def add_rows(self, count):
+        for i in range(count):
+            post = Post.objects.create(
+                author=self.admin, text=f'Пост {i}', group=self.groups[i % 3]
+            )
+            Comment.objects.create(post=post, author=self.admin, text='Ок')
+        Follow.objects.get_or_create(user=self.admin, author=self.admin)
+
+    def changelist_queries(self, model):
+        url = reverse(f'admin:posts_{model}_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, HTTPStatus.OK)
+        return len(queries)
+
+    def test_queries_do_not_grow_with_rows(self):
+        """Число запросов списка не зависит от числа строк на странице."""
+        for model in ('post', 'comment', 'follow'):
+            with self.subTest(model=model):
+                self.add_rows(2)
+                cache.clear()
+                few = self.changelist_queries(model)
+                self.add_rows(10)
+                cache.clear()
+                self.assertEqual(self.changelist_queries(model), few)
+
+    def test_count_is_cached(self):
+        """Повторный показ списка не пересчитывает строки."""
+        self.add_rows(2)
+        first = self.changelist_queries('post')
+        self.assertEqual(self.changelist_queries('post'), first - 1)
@@ -0,0 +1,207 @@
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.db import transaction
+from PIL import features
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import cards, etags
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # spawn, а не fork: дочерний процесс не должен наследовать
+        # соединения с БД и кэшем веб-воркера. Django настраивается
+        # до того, как процесс распакует первую задачу.
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup
+        )
+    return _executor
+
+
+def variants():
+    """Все варианты картинки поста: ширины POST_IMAGE_SIZES в каждом
+    из форматов POST_IMAGE_FORMATS, которые умеет писать Pillow.
+    """
+    formats = [
+        image_format for image_format in settings.POST_IMAGE_FORMATS
+        if image_format != 'WEBP' or features.check('webp')
+    ]
+    return [
+        (width, image_format, f'{width}x{height}', {
+            'crop': 'center',
+            'upscale': True,
+            'format': image_format,
+        })
+        for width, height in settings.POST_IMAGE_SIZES
+        for image_format in formats
+    ]
+
+
+def generate(post_id, image_name):
+    """Строит все варианты картинки и обновляет карточку поста."""
+    try:
+        backend.generate_many(image_name, variants())
+    except Exception:
+        logger.exception('Не удалось построить миниатюры %s', image_name)
+        return
+    cards.bump_post(post_id)
+    etags.touch(*etags.stored_post_scopes(post_id))
+
+
+def pregenerate(post):
+    """Ставит построение миниатюр поста в пул процессов после коммита.
+
+    При THUMBNAIL_WORKERS = 0 миниатюры строятся сразу, в этом процессе.
+    """
+    if not post.image:
+        return
+    if not settings.THUMBNAIL_WORKERS:
+        generate(post.pk, post.image.name)
+        return
+    transaction.on_commit(lambda: _submit(post.pk, post.image.name))
+
+
+def _submit(post_id, image_name):
+    global _executor
+    try:
+        _get_executor().submit(generate, post_id, image_name)
+    except BrokenProcessPool:
+        # Упавший пул пересоздаётся; картинки отстроит следующая попытка
+        # или команда pregenerate_thumbnails.
+        logger.exception('Пул миниатюр недоступен, пересоздаётся')
+        _executor = None
+
+
+class PostImageBackend(ThumbnailBackend):
+    """Бэкенд sorl для картинок постов.
+
+    В запросе только ищет готовые миниатюры и никогда не декодирует
+    исходник; строит все варианты за одно декодирование.
+    """
+
+    def _options(self, source, options):
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        return options
+
+    def _thumbnail(self, source, geometry_string, options):
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def lookup(self, file_, geometry_string, **options):
+        """Готовая миниатюра или None, если она ещё не построена."""
+        return self.lookup_many([(file_, geometry_string, options)])[0]
+
+    def lookup_many(self, requests):
+        """lookup для списка (файл, геометрия, опции) разом.
+
+        Записи kvstore достаются одним get_many из кэша и одним запросом
+        к БД на промахи, а не запросом на каждую миниатюру.
+        """
+        thumbnails = [
+            self._thumbnail(
+                source, geometry_string, self._options(source, dict(options))
+            )
+            for source, geometry_string, options in (
+                (ImageFile(file_), geometry_string, options)
+                for file_, geometry_string, options in requests
+            )
+        ]
+        store = default.kvstore
+        if not isinstance(store, cached_db_kvstore.KVStore):
+            return [store.get(thumbnail) for thumbnail in thumbnails]
+        keys = [add_prefix(thumbnail.key) for thumbnail in thumbnails]
+        values = store.cache.get_many(keys)
+        missing = [key for key in keys if key not in values]
+        if missing:
+            found = dict(KVStoreModel.objects.filter(
+                key__in=missing
+            ).values_list('key', 'value'))
+            fetched = {
+                key: found.get(key, cached_db_kvstore.EMPTY_VALUE)
+                for key in missing
+            }
+            store.cache.set_many(
+                fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT
+            )
+            values.update(fetched)
+        empty = (None, cached_db_kvstore.EMPTY_VALUE)
+        return [
+            None if values[key] in empty
+            else deserialize_image_file(values[key])
+            for key in keys
+        ]
+
+    def generate_many(self, file_, variants):
+        source = ImageFile(file_)
+        source_image = default.engine.get_image(source)
+        try:
+            source.set_size(default.engine.get_image_size(source_image))
+            image_info = default.engine.get_image_info(source_image)
+            default.kvstore.get_or_set(source)
+            for *_, geometry_string, options in variants:
+                options = self._options(source, dict(options))
+                thumbnail = self._thumbnail(source, geometry_string, options)
+                if not thumbnail.exists():
+                    options['image_info'] = image_info
+                    self._create_thumbnail(
+                        source_image, geometry_string, options, thumbnail
+                    )
+                default.kvstore.set(thumbnail, source)
+        finally:
+            default.engine.cleanup(source_image)
+
+
+backend = PostImageBackend()
+
+
+def ready_variants(image):
+    """Готовые варианты картинки: {формат: [(ширина, миниатюра), ...]}."""
+    return ready_variants_many([image])[image.name]
+
+
+def ready_variants_many(images):
+    """ready_variants для всех картинок страницы сразу: {имя: варианты}."""
+    wanted = [
+        (image, width, image_format, geometry_string, options)
+        for image in images
+        for width, image_format, geometry_string, options in variants()
+    ]
+    thumbnails = backend.lookup_many([
+        (image, geometry_string, options)
+        for image, _, _, geometry_string, options in wanted
+    ])
+    ready = {image.name: {} for image in images}
+    for (image, width, image_format, *_), thumbnail in zip(
+        wanted, thumbnails
+    ):
+        if thumbnail:
+            ready[image.name].setdefault(image_format, []).append(
+                (width, thumbnail)
+            )
+    return ready
@@ -0,0 +1,81 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Follow, Post, Timeline
+
+
+def _bulk_push(entries):
+    """Вставляет записи ленты пачками, не держа их все в памяти."""
+    entries = iter(entries)
+    batch = list(islice(entries, settings.TIMELINE_BATCH_SIZE))
+    while batch:
+        Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+        batch = list(islice(entries, settings.TIMELINE_BATCH_SIZE))
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора пачками."""
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _bulk_push(
+        Timeline(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date
+        )
+        for user_id in followers.iterator(
+            chunk_size=settings.TIMELINE_BATCH_SIZE
+        )
+    )
+
+
+def add_author(follow):
+    """Добавляет в ленту подписчика все посты автора."""
+    posts = follow.author.posts.values_list('pk', 'pub_date')
+    _bulk_push(
+        Timeline(
+            user_id=follow.user_id,
+            post_id=post_id,
+            author_id=follow.author_id,
+            pub_date=pub_date
+        )
+        for post_id, pub_date in posts.iterator(
+            chunk_size=settings.TIMELINE_BATCH_SIZE
+        )
+    )
+
+
+def remove_author(follow):
+    """Убирает из ленты подписчика посты автора."""
+    Timeline.objects.filter(
+        user_id=follow.user_id,
+        author_id=follow.author_id
+    ).delete()
+
+
+@transaction.atomic
+def rebuild_timelines():
+    """Пересобирает все ленты подписок с нуля."""
+    Timeline.objects.all().delete()
+    # Один проход по соединению подписок с постами вместо запроса
+    # на каждую подписку.
+    entries = Post.objects.filter(
+        author__following__isnull=False
+    ).values_list(
+        'author__following__user_id', 'pk', 'author_id', 'pub_date'
+    ).order_by()
+    _bulk_push(
+        Timeline(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date
+        )
+        for user_id, post_id, author_id, pub_date in entries.iterator(
+            chunk_size=settings.TIMELINE_BATCH_SIZE
+        )
+    )
@@ -0,0 +1,108 @@
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import ExpressionWrapper, F, FloatField, Value
+from django.db.models.functions import Greatest, Least, Log, Power
+from django.utils import timezone
+
+from .models import Comment, TrendingScore
+from .utils import batches, decode_score_cursor, score_page
+
+
+def point(moment):
+    """Вклад комментария в момент ``moment`` в логарифмической шкале."""
+    return moment.timestamp() / settings.TRENDING_HALF_LIFE
+
+
+def log_add(a, b):
+    """log2(2^a + 2^b) без переполнения."""
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def threshold(now=None):
+    """Счёт, ниже которого пост уже не популярен."""
+    return point(now or timezone.now()) + math.log2(
+        settings.TRENDING_MIN_SCORE
+    )
+
+
+def bump(post_id, moment):
+    """Добавляет к счёту поста комментарий, оставленный в ``moment``.
+
+    Строка счёта создаётся INSERT OR IGNORE с ничтожным счётом, затем
+    счёт меняется одним UPDATE, как счётчики в counters: два запроса
+    без точек сохранения, и параллельные комментарии не теряют друг
+    друга.
+    """
+    value = point(moment)
+    # 2^-64 теряется при сложении в double: итог равен ровно value.
+    TrendingScore.objects.bulk_create(
+        [TrendingScore(post_id=post_id, score=value - 64)],
+        ignore_conflicts=True
+    )
+    value = Value(value, output_field=FloatField())
+    high = Greatest(F('score'), value)
+    low = Least(F('score'), value)
+    TrendingScore.objects.filter(post_id=post_id).update(
+        score=ExpressionWrapper(
+            high + Log(2, Value(1.0) + Power(2, low - high)),
+            output_field=FloatField()
+        )
+    )
+
+
+def prune(now=None):
+    """Удаляет затухшие счета; возвращает, сколько удалено."""
+    deleted, _ = TrendingScore.objects.filter(
+        score__lt=threshold(now)
+    ).delete()
+    return deleted
+
+
+@transaction.atomic
+def rebuild(now=None):
+    """Пересчитывает счета по комментариям, которые ещё не затухли.
+
+    Нужен после массовой записи комментариев без сигналов.
+    """
+    now = now or timezone.now()
+    # Комментарий старше этого сам по себе ниже порога.
+    since = now - timedelta(
+        seconds=-math.log2(settings.TRENDING_MIN_SCORE)
+        * settings.TRENDING_HALF_LIFE
+    )
+    scores = defaultdict(lambda: -math.inf)
+    comments = Comment.objects.filter(created__gte=since).values_list(
+        'post_id', 'created'
+    ).order_by()
+    for post_id, created in comments.iterator(chunk_size=10000):
+        scores[post_id] = log_add(scores[post_id], point(created))
+    TrendingScore.objects.all().delete()
+    for batch in batches(scores.items(), 500):
+        TrendingScore.objects.bulk_create(
+            TrendingScore(post_id=post_id, score=score)
+            for post_id, score in batch
+        )
+    return len(scores) - prune(now)
+
+
+def trending_page(posts, cursor, per_page):
+    """Страница ленты «Популярное», листается курсором (счёт, id).
+
+    Порядок берётся из индекса по счёту, ``posts`` - выборка, из которой
+    достаются посты страницы.
+    """
+    scores = TrendingScore.objects.filter(score__gte=threshold())
+    after = decode_score_cursor(cursor or '')
+    if after:
+        # Не OR, а диапазон с исключением: SQLite идёт по индексу счёта
+        # в нужном порядке, без сортировки.
+        scores = scores.filter(score__lte=after[0]).exclude(
+            score=after[0], post_id__gte=after[1]
+        )
+    rows = list(scores.values_list('post_id', 'score')[:per_page + 1])
+    return score_page(posts, rows, per_page)
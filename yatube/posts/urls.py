@@ -1,13 +1,46 @@
 from django.urls import path
 
-from . import views
+from . import feeds, views
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('cards/', views.index_cards, name='index_cards'),
+    path('events/', views.index_events, name='index_events'),
+    path('rss/', feeds.IndexFeed(), name='index_rss'),
+    path('atom/', feeds.IndexAtomFeed(), name='index_atom'),
+    path('trending/', views.trending, name='trending'),
+    path('groups/', views.group_index, name='groups'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    path(
+        'group/<slug:slug>/cards/',
+        views.group_cards,
+        name='group_cards'
+    ),
+    path(
+        'group/<slug:slug>/events/',
+        views.group_events,
+        name='group_events'
+    ),
+    path('group/<slug:slug>/rss/', feeds.GroupFeed(), name='group_rss'),
+    path('group/<slug:slug>/atom/', feeds.GroupAtomFeed(), name='group_atom'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path(
+        'profile/<str:username>/cards/',
+        views.profile_cards,
+        name='profile_cards'
+    ),
+    path(
+        'profile/<str:username>/rss/',
+        feeds.AuthorFeed(),
+        name='profile_rss'
+    ),
+    path(
+        'profile/<str:username>/atom/',
+        feeds.AuthorAtomFeed(),
+        name='profile_atom'
+    ),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
@@ -17,6 +50,10 @@ urlpatterns = [
         name='add_comment'
     ),
     path('follow/', views.follow_index, name='follow_index'),
+    path('follow/cards/', views.follow_cards, name='follow_cards'),
+    path('follow/events/', views.follow_events, name='follow_events'),
+    path('search/', views.search, name='search'),
+    path('export/', views.export, name='export'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
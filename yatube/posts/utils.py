@@ -1,8 +1,205 @@
+from functools import reduce
+from itertools import islice
+from operator import or_
+
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db.models import Q, Subquery
+from django.utils.dateparse import parse_datetime
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .models import Comment
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(obj, direction, keys=('pub_date', 'pk')):
+    """Упаковывает ключ (pub_date, id) записи в непрозрачный токен."""
+    pub_date, pk = (getattr(obj, key) for key in keys)
+    raw = f'{direction}|{pub_date.isoformat()}|{pk}'
+    return urlsafe_base64_encode(raw.encode())
+
+
+def decode_cursor(token):
+    """Распаковывает токен курсора в (направление, pub_date, id)."""
+    try:
+        direction, pub_date, pk = (
+            urlsafe_base64_decode(token).decode().split('|')
+        )
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidPage('Некорректный курсор')
+    if direction not in (NEXT, PREVIOUS) or pub_date is None:
+        raise InvalidPage('Некорректный курсор')
+    return direction, pub_date, pk
+
+
+class CursorPage(Page):
+    """Страница ленты, адресуемая курсором, а не номером."""
+
+    cursor_mode = True
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<Cursor page of {len(self.object_list)} objects>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(Paginator):
+    """Пагинация по ключу (pub_date, id) без COUNT(*) и OFFSET.
+
+    ``keys`` - поля записей, по которым сортируется и фильтруется
+    выборка: дата публикации и id поста (свои или денормализованные).
+    """
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'pk')):
+        super().__init__(object_list, per_page)
+        self.keys = keys
+
+    def _keyset(self, direction, pub_date, pk):
+        date_key, pk_key = self.keys
+        op = 'lt' if direction == NEXT else 'gt'
+        order = '-' if direction == NEXT else ''
+        return self.object_list.filter(
+            Q(**{f'{date_key}__{op}': pub_date})
+            | Q(**{date_key: pub_date, f'{pk_key}__{op}': pk})
+        ).order_by(f'{order}{date_key}', f'{order}{pk_key}')
+
+    def page(self, cursor=None):
+        date_key, pk_key = self.keys
+        if cursor:
+            direction, pub_date, pk = decode_cursor(cursor)
+            posts = self._keyset(direction, pub_date, pk)
+        else:
+            direction = NEXT
+            posts = self.object_list.order_by(f'-{date_key}', f'-{pk_key}')
+        posts = list(posts[:self.per_page + 1])
+        has_more = len(posts) > self.per_page
+        posts = posts[:self.per_page]
+
+        if direction == PREVIOUS:
+            posts.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, bool(cursor)
+
+        next_cursor = previous_cursor = None
+        if posts and has_next:
+            next_cursor = encode_cursor(posts[-1], NEXT, self.keys)
+        if posts and has_previous:
+            previous_cursor = encode_cursor(posts[0], PREVIOUS, self.keys)
+        return CursorPage(posts, self, next_cursor, previous_cursor)
+
+    def get_page(self, cursor=None):
+        try:
+            return self.page(cursor)
+        except InvalidPage:
+            return self.page()
+
+
+def encode_score_cursor(score, pk):
+    """Курсор выдачи, упорядоченной по счёту: (число, id) в base64."""
+    return urlsafe_base64_encode(f'{score!r}|{pk}'.encode())
+
+
+def decode_score_cursor(token):
+    """(счёт, id) из курсора или None, если курсор негоден."""
+    try:
+        score, pk = urlsafe_base64_decode(token).decode().split('|')
+        return float(score), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def score_page(posts, rows, per_page):
+    """Страница выдачи по строкам (id, счёт) из индекса.
+
+    ``rows`` - до per_page + 1 строк в порядке выдачи: лишняя строка
+    говорит, что есть следующая страница. Посты достаются из ``posts``
+    одним запросом; курсор указывает на последнюю строку страницы.
+    """
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    found = posts.in_bulk([pk for pk, _ in rows])
+    page = [found[pk] for pk, _ in rows if pk in found]
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_score_cursor(rows[-1][1], rows[-1][0])
+    return CursorPage(page, None, next_cursor, None)
+
+
+def get_paginator(request, posts, keys=('pub_date', 'pk')):
+    """Возвращает страницу ленты.
+
+    Небольшие выборки листаются по номерам страниц, большие - курсором,
+    чтобы глубокие страницы не требовали COUNT(*) и OFFSET.
+    """
+    cursor = request.GET.get('cursor')
+    if cursor is None:
+        limit = settings.POSTS_ON_PAGE * settings.POSTS_NUMBERED_PAGES
+        # Подсчёт ограничен сверху, полный COUNT(*) не выполняется.
+        count = posts[:limit + 1].count()
+        if count <= limit:
+            paginator = Paginator(posts, settings.POSTS_ON_PAGE)
+            paginator.count = count
+            return paginator.get_page(request.GET.get('page'))
+    paginator = CursorPaginator(posts, settings.POSTS_ON_PAGE, keys)
+    return paginator.get_page(cursor)
+
+
+def attach_comment_previews(posts):
+    """Кладёт в ``post.comment_previews`` последние комментарии постов.
+
+    На каждый пост - свой некоррелированный подзапрос с LIMIT по индексу
+    (post, created), поэтому читается не больше COMMENTS_PREVIEW строк на
+    пост, сколько бы комментариев у него ни было. Все подзапросы идут
+    одним запросом; посты без комментариев пропускаются по счётчику.
+    """
+    previews = {}
+    for post in posts:
+        post.comment_previews = previews.setdefault(post.pk, [])
+    commented = {post.pk for post in posts if post.comments_count}
+    if not commented:
+        return
+    limit = settings.COMMENTS_PREVIEW
+    latest = reduce(or_, (
+        Q(pk__in=Subquery(Comment.objects.filter(post_id=post_id).order_by(
+            '-created', '-pk'
+        ).values('pk')[:limit]))
+        for post_id in commented
+    ))
+    comments = Comment.objects.filter(latest).select_related(
+        'author'
+    ).order_by()
+    for comment in sorted(comments, key=lambda c: (c.created, c.pk)):
+        previews[comment.post_id].append(comment)
+
+
+def for_feed(posts, prefix=''):
+    """Подгружает авторов и группы для карточек постов ленты.
+
+    ``prefix`` - путь к посту, если лента строится по связанной модели.
+    Превью комментариев добавляет attach_comment_previews, и только для
+    карточек, которых нет в кэше.
+    """
+    return posts.select_related(f'{prefix}author', f'{prefix}group')
 
 
-def get_paginator(request, posts):
-    paginator = Paginator(posts, settings.POSTS_ON_PAGE)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+def batches(objects, size):
+    """Режет поток объектов на списки не длиннее size."""
+    objects = iter(objects)
+    batch = list(islice(objects, size))
+    while batch:
+        yield batch
+        batch = list(islice(objects, size))
@@ -1,13 +1,33 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.files.storage import default_storage
+from django.core.paginator import InvalidPage
+from django.db.models import Prefetch
+from django.http import (
+    HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+)
 from django.shortcuts import render, get_object_or_404, redirect
-
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.views.decorators.http import etag
+
+from . import directory, events, follows
+from .cards import render_cards
+from .etags import (
+    follow_etag, group_etag, groups_etag, index_etag, post_etag, profile_etag
+)
+from .export import export_lines
 from .forms import PostForm, CommentForm
-from .models import Post, Group, User, Follow
-from .utils import get_paginator
+from .models import Post, Group, User, Follow, Comment, Suggestion
+from .search import search_page
+from .thumbnails import pregenerate
+from .trending import trending_page
+from .utils import CursorPaginator, for_feed, get_paginator
 
 
+@etag(index_etag)
 def index(request):
-    posts = Post.objects.select_related('author', 'group')
+    posts = for_feed(Post.objects.all())
     page_obj = get_paginator(request, posts)
     context = {
         'page_obj': page_obj,
@@ -15,9 +35,29 @@ def index(request):
     return render(request, 'posts/index.html', context)
 
 
+@etag(index_etag)
+def trending(request):
+    page_obj = trending_page(
+        for_feed(Post.objects.all()),
+        request.GET.get('cursor'),
+        settings.POSTS_ON_PAGE
+    )
+    return render(request, 'posts/trending.html', {'page_obj': page_obj})
+
+
+@etag(groups_etag)
+def group_index(request):
+    html = directory.render_page(request.GET.get('page'))
+    context = {
+        'directory': mark_safe(html),
+    }
+    return render(request, 'posts/group_index.html', context)
+
+
+@etag(group_etag)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.group_posts.select_related('author', 'group')
+    posts = for_feed(group.group_posts.all())
     page_obj = get_paginator(request, posts)
     context = {
         'group': group,
@@ -26,27 +66,52 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+def _suggestions(user):
+    """Рекомендации пользователя одним чтением по индексу (user, rank).
+
+    Список считается командой compute_suggestions; авторы, на которых
+    пользователь подписался после пересчёта, отсеиваются по графу
+    подписок.
+    """
+    if not user.is_authenticated:
+        return []
+    suggestions = list(
+        Suggestion.objects.filter(user=user).select_related('author')
+    )
+    if not suggestions:
+        return []
+    following = follows.following(user)
+    return [
+        suggestion for suggestion in suggestions
+        if suggestion.author_id not in following
+    ]
+
+
+@etag(profile_etag)
 def profile(request, username):
-    author = User.objects.get(username=username)
-    posts = author.posts.select_related('author', 'group')
-    page_obj = get_paginator(request, posts)
-    following = (
-        request.user.is_authenticated
-        and Follow.objects.filter(
-            user=request.user,
-            author=author
-        ).exists()
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
     )
+    posts = for_feed(author.posts.all())
+    page_obj = get_paginator(request, posts)
+    following = author.pk in follows.following(request.user)
     context = {
         'author': author,
         'page_obj': page_obj,
         'following': following,
+        'suggestions': _suggestions(request.user),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@etag(post_etag)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group').prefetch_related(
+            Prefetch('comments', Comment.objects.select_related('author'))
+        ),
+        pk=post_id
+    )
     form = CommentForm()
     context = {
         'post': post,
@@ -55,6 +120,95 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+def _cards(request, posts, keys=('pub_date', 'pk'), load=None, **options):
+    """Карточки следующей порции ленты и курсор порции за ней.
+
+    Отдаются без base.html, шапки и подвала: прокрутка ленты стоит
+    одной выборки постов и рендеринга их карточек.
+    """
+    paginator = CursorPaginator(posts, settings.POSTS_ON_PAGE, keys)
+    try:
+        page_obj = paginator.page(request.GET.get('cursor'))
+    except InvalidPage as error:
+        return HttpResponseBadRequest(str(error))
+    posts = list(page_obj) if load is None else load(page_obj)
+    html = render_to_string('includes/cards_fragment.html', {
+        'cards': [mark_safe(card) for card in render_cards(posts, **options)]
+    })
+    return JsonResponse({'html': html, 'next_cursor': page_obj.next_cursor})
+
+
+@etag(index_etag)
+def index_cards(request):
+    return _cards(request, for_feed(Post.objects.all()), author_posts=True)
+
+
+@etag(group_etag)
+def group_cards(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return _cards(
+        request, for_feed(group.group_posts.all()),
+        author_posts=True, groups=True
+    )
+
+
+@etag(profile_etag)
+def profile_cards(request, username):
+    author = get_object_or_404(User, username=username)
+    return _cards(request, for_feed(author.posts.all()))
+
+
+@login_required
+@etag(follow_etag)
+def follow_cards(request):
+    entries = for_feed(request.user.timeline.all(), prefix='post__')
+    return _cards(
+        request, entries, keys=('pub_date', 'post_id'),
+        load=lambda page_obj: [entry.post for entry in page_obj],
+        author_posts=True
+    )
+
+
+def _events(request, matches):
+    """Поток SSE о новых постах ленты с места Last-Event-ID.
+
+    Вкладка, закрывшая поток на время скрытия, передаёт место в
+    параметре last_event_id: заголовок шлёт только сам EventSource.
+    """
+    since = request.META.get(
+        'HTTP_LAST_EVENT_ID', request.GET.get('last_event_id', '')
+    )
+    stream = events.open_stream(
+        matches, int(since) if since.isdigit() else None
+    )
+    if stream is None:
+        response = HttpResponse(
+            'Слишком много подключений', status=503,
+            content_type='text/plain; charset=utf-8'
+        )
+        response['Retry-After'] = settings.SSE_RETRY_MS // 1000
+        return response
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def index_events(request):
+    return _events(request, lambda entry: True)
+
+
+def group_events(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return _events(request, lambda entry: entry[2] == group.pk)
+
+
+@login_required
+def follow_events(request):
+    authors = follows.following(request.user)
+    return _events(request, lambda entry: entry[1] in authors)
+
+
 @login_required()
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -63,6 +217,7 @@ def post_create(request):
         form = form.save(commit=False)
         form.author = request.user
         form.save()
+        pregenerate(form)
         return redirect('posts:profile', form.author)
 
     context = {
@@ -85,6 +240,8 @@ def post_edit(request, post_id):
     if form.is_valid():
         form.author = request.user
         form.save()
+        if 'image' in form.changed_data:
+            pregenerate(post)
         return redirect('posts:post_detail', post_id)
 
     is_edit = True
@@ -98,7 +255,10 @@ def post_edit(request, post_id):
 
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    # Автор и группа нужны сигналу, чтобы сбросить ETag страниц поста.
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), pk=post_id
+    )
     form = CommentForm(request.POST or None)
 
     if form.is_valid():
@@ -111,13 +271,14 @@ def add_comment(request, post_id):
 
 
 @login_required
+@etag(follow_etag)
 def follow_index(request):
-    posts = Post.objects.filter(
-        author__following__user=request.user
-    ).select_related('author', 'group')
-    page_obj = get_paginator(request, posts)
+    entries = for_feed(request.user.timeline.all(), prefix='post__')
+    page_obj = get_paginator(request, entries, keys=('pub_date', 'post_id'))
+    page_obj.object_list = [entry.post for entry in page_obj]
     context = {
         'page_obj': page_obj,
+        'suggestions': _suggestions(request.user),
     }
     return render(request, 'posts/follow.html', context)
 
@@ -140,6 +301,39 @@ def profile_unfollow(request, username):
     if author == request.user:
         return redirect('posts:profile', username=username)
 
-    following = get_object_or_404(Follow, user=request.user, author=author)
+    following = get_object_or_404(
+        Follow.objects.select_related('user', 'author'),
+        user=request.user, author=author
+    )
     following.delete()
     return redirect('posts:profile', username=username)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = search_page(
+        for_feed(Post.objects.all()),
+        query,
+        request.GET.get('cursor'),
+        settings.POSTS_ON_PAGE
+    )
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@login_required
+def export(request):
+    def image_url(name):
+        return request.build_absolute_uri(default_storage.url(name))
+
+    response = StreamingHttpResponse(
+        export_lines(request.user, image_url),
+        content_type='application/x-ndjson; charset=utf-8'
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{request.user.username}.ndjson"'
+    )
+    return response
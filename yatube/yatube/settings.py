@@ -26,11 +26,13 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
     'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -45,7 +47,7 @@ ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.metrics.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -108,6 +110,16 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POSTS_ON_PAGE = 10
 
+POSTS_NUMBERED_PAGES = 10
+
+GROUPS_ON_PAGE = 20
+
+COMMENTS_PREVIEW = 5
+
+TIMELINE_BATCH_SIZE = 500
+
+EXPORT_CHUNK_SIZE = 2000
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
@@ -116,10 +128,80 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
     }
 }
 
+# Тесты работают со своим кэшем во временном каталоге, а не с общим
+# cache.sqlite3 хоста.
+TEST_RUNNER = 'core.runner.TempCacheRunner'
+
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+FEED_ITEMS = 20
+
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+
+GROUP_DIRECTORY_CACHE_TIMEOUT = 60 * 60 * 24
+
+API_PAYLOAD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Сколько потоков SSE может быть открыто на хосте сразу, во всех
+# воркерах вместе. Каждый поток занимает поток WSGI-сервера на
+# SSE_STREAM_SECONDS, поэтому значение должно быть заметно меньше общего
+# числа потоков всех воркеров хоста (для sync-воркеров - числа воркеров),
+# иначе обычным запросам не останется потоков. Места потоков - ключи
+# кэша, занимаемые атомарным add, поэтому кэш должен быть общим для всех
+# воркеров хоста, как SQLiteCache. Место убитого воркера освобождается
+# само через SSE_STREAM_SECONDS + SSE_KEEPALIVE.
+SSE_MAX_CONNECTIONS = 4
+
+SSE_POLL_INTERVAL = 2
+
+SSE_KEEPALIVE = 15
+
+SSE_STREAM_SECONDS = 300
+
+SSE_RETRY_MS = 5000
+
+EVENTS_LOG_SIZE = 1000
+
+EVENTS_LOG_TIMEOUT = 60 * 60
+
+FOLLOW_GRAPH_TIMEOUT = 60 * 60 * 24
+
+SUGGESTIONS_TOP = 5
+
+# За сколько секунд вклад комментария в популярность поста падает вдвое.
+TRENDING_HALF_LIFE = 60 * 60 * 6
+
+# Посты, чей счёт затух ниже этого, убираются из ленты «Популярное».
+TRENDING_MIN_SCORE = 0.05
+
+POST_IMAGE_SIZES = (
+    (480, 300),
+    (768, 480),
+    (960, 600),
+)
+
+POST_IMAGE_FORMATS = ('WEBP', 'JPEG')
+
+POST_IMAGE_SIZES_ATTR = '(max-width: 960px) 100vw, 960px'
+
+THUMBNAIL_WORKERS = 2
+
+ADMIN_COUNT_CACHE_TIMEOUT = 60
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
+
+# Адреса, с которых /metrics доступны без входа персонала. По умолчанию
+# пусто: за обратным прокси все запросы приходят с 127.0.0.1, поэтому
+# адреса сюда добавляются, только если до приложения доходит адрес
+# клиента (например, сборщика метрик во внутренней сети).
+METRICS_ALLOWED_IPS = []